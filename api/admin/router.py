@@ -1,7 +1,10 @@
+from typing import List
+
 from fastapi import APIRouter, Depends, HTTPException, Query
 
 from common.auth import admin_only
 from common.redis_manager import redis_manager
+from common.schemas import APIKeyUsage
 
 router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(admin_only)])
 
@@ -15,7 +18,7 @@ def create(name: str = Query(..., min_length=3, max_length=50, pattern=r"^[a-zA-
         raise HTTPException(400, str(e))
 
 
-@router.get("/keys", operation_id="keys_list")
+@router.get("/keys", response_model=List[APIKeyUsage], operation_id="keys_list")
 def list():
     return redis_manager.list_keys()
 
@@ -0,0 +1,64 @@
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response
+
+from common.auth import verify_token_no_backlog
+from common.config import settings
+from common.logger import logger
+from common.redis_manager import redis_manager
+from common.schemas import BLOB_REF_PREFIX, BlobResponse
+from common.storage import (
+    BlobTooLargeError,
+    collect_expired_blobs,
+    get_blob_path,
+    save_blob,
+)
+
+router = APIRouter(prefix="/blobs", tags=["Blobs"], dependencies=[Depends(verify_token_no_backlog)])
+
+
+def _collect_expired_blobs():
+    try:
+        if redis_manager.acquire_blob_gc_lock(settings.blob_gc_interval_seconds):
+            collect_expired_blobs()
+    except Exception as e:
+        logger.warning(f"Blob garbage collection failed: {e}")
+
+
+@router.post(
+    "",
+    response_model=BlobResponse,
+    operation_id="blobs_create",
+    description=(
+        "Upload a raw image or video as the request body. The returned `ref` can be passed in place of "
+        "base64 data in any request, keeping large inputs out of the task queue. "
+        "Check `HEAD /api/blobs/{id}` first to skip uploading content the API already has."
+    ),
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/octet-stream": {"schema": {"type": "string", "format": "binary"}}},
+        }
+    },
+)
+async def create(request: Request, background_tasks: BackgroundTasks):
+    try:
+        blob_id, size = await save_blob(request.stream())
+    except BlobTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Uploads are the only writes to the blob store so they also drive its garbage collection
+    background_tasks.add_task(_collect_expired_blobs)
+    return BlobResponse(id=blob_id, ref=f"{BLOB_REF_PREFIX}{blob_id}", size=size)
+
+
+@router.head("/{blob_id}", operation_id="blobs_exists")
+def exists(blob_id: str):
+    try:
+        blob_path = get_blob_path(blob_id)
+        stat = blob_path.stat()
+    except (ValueError, FileNotFoundError):
+        raise HTTPException(status_code=404, detail="Blob not found")
+
+    blob_path.touch()  # The client is about to reference it
+    return Response(status_code=200, headers={"Content-Length": str(stat.st_size)})
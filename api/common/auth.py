@@ -23,18 +23,16 @@ api_key_header = APIKeyHeader(name="Authorization")
 admin_api_key_header = APIKeyHeader(name="Authorization")
 
 
-async def verify_token(
-    request: Request,
-    authorization: str = Depends(api_key_header),
-) -> Identity:
+async def _authenticate(request: Request, authorization: str) -> Identity:
     if not authorization:
         raise HTTPException(status_code=403, detail="Missing authorization token")
 
     token = authorization.replace("Bearer ", "")
 
-    key_data = redis_manager.verify_token(token)
+    key_data = await redis_manager.verify_token_async(token)
     if not key_data:
         raise HTTPException(status_code=403, detail="Invalid or revoked token")
+    redis_manager.record_key_usage(key_data.key_id)
 
     identity = Identity(
         user_id=request.headers.get("x-user-id", "unknown"),
@@ -44,10 +42,18 @@ async def verify_token(
         key_id=key_data.key_id,
     )
     await log_request(request, identity)
+    return identity
+
+
+async def verify_token(
+    request: Request,
+    authorization: str = Depends(api_key_header),
+) -> Identity:
+    identity = await _authenticate(request, authorization)
 
     # Only limit POST requests (task creation)
     if request.method == "POST":
-        waiting_tasks = redis_manager.waiting_tasks()
+        waiting_tasks = await redis_manager.waiting_tasks_async()
         if waiting_tasks >= settings.task_backlog_limit:
             raise HTTPException(
                 status_code=429,
@@ -57,6 +63,14 @@ async def verify_token(
     return identity
 
 
+async def verify_token_no_backlog(
+    request: Request,
+    authorization: str = Depends(api_key_header),
+) -> Identity:
+    # For POST requests that do not create tasks (uploads, status lookups), not subject to the backlog limit
+    return await _authenticate(request, authorization)
+
+
 # Restrict all admin endpoints to those with the Admin Key
 def admin_only(authorization: str = Depends(admin_api_key_header)):
     token = authorization.replace("Bearer ", "")
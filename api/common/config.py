@@ -1,6 +1,7 @@
 import hashlib
 import logging
 import os
+from typing import Literal, Optional
 
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -17,11 +18,24 @@ class Settings(BaseSettings):
     # external services should use this to reach the API / used for signed URLs
     ddiffusion_storage_address: str = "http://127.0.0.1:5000"
     ddiffusion_storage_directory: str = "/STORAGE"
-    flower_url: str = "http://flower:5555"
     signed_url_expiry_seconds: int = 3600 * 1  # 1 hour
+    # NOTE s3 only covers task outputs, uploaded input blobs still need the shared storage directory
+    storage_backend: Literal["local", "s3"] = "local"  # Where task outputs are kept, s3 also covers MinIO
+    s3_bucket: str = ""
+    s3_endpoint_url: Optional[str] = None  # Leave unset for AWS, e.g. http://minio:9000 for MinIO
+    s3_public_endpoint_url: Optional[str] = None  # Endpoint clients download from, if it differs from the above
+    s3_region: Optional[str] = None
     task_backlog_limit: int = 100  # Max number of waiting tasks allowed before rejecting new ones
     enable_mcp: bool = True
-    result_expires_days: int = 30  # Number of days to keep task results
+    enable_metrics: bool = False  # Prometheus metrics on /metrics, not authenticated so keep it off public networks
+    result_expires_days: int = 30  # Number of days to keep task results, also how long unused input blobs are kept
+    blob_gc_interval_seconds: int = 3600  # Minimum time between sweeps of expired input blobs
+    enable_affinity_routing: bool = False  # Route gpu tasks to workers that already have the pipeline loaded
+    affinity_ttl_seconds: int = 60  # Ignore workers that have not refreshed their resident pipelines in this window
+    affinity_max_queue_length: int = 2  # Fall back to the shared queue once a warm worker has this many tasks waiting
+    task_log_tail_lines: int = 100  # Number of recent log lines returned for a running task
+    token_cache_ttl_seconds: int = 30  # Verified API keys are cached in memory for this long, 0 disables
+    token_cache_max_size: int = 1024
 
     @property
     def encoded_storage_key(self) -> bytes:
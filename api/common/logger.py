@@ -20,13 +20,14 @@ def log_pretty(message, obj):
 
 
 async def log_request(request: Request, identity: Identity):
-    """Logs the request with identity and body if it's a POST request."""
+    """Logs the request with identity and body if it's a JSON POST request."""
 
     user_id = identity.user_id
     key_name = identity.key_name
     identity_str = f"{key_name} ({user_id})"
 
-    if request.method == "POST":
+    # NOTE binary uploads are streamed by the route handler so they must not be read here
+    if request.method == "POST" and request.headers.get("content-type", "").startswith("application/json"):
         body_str = ""
         body_bytes = await request.body()
         request._body = body_bytes  # Preserve for route handler
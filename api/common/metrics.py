@@ -0,0 +1,45 @@
+import os
+import time
+from contextlib import contextmanager
+
+from fastapi import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Same buckets as the worker stages, so API and worker histograms can be shown side by side
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+STAGE_SECONDS = Histogram(
+    "ddiffusion_api_stage_seconds",
+    "Time the API spends in each stage of creating a task",
+    ["task", "stage"],
+    buckets=STAGE_BUCKETS,
+)
+
+
+@contextmanager
+def span(task_name: str, stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(task=task_name, stage=stage).observe(time.perf_counter() - start)
+
+
+def metrics_response() -> Response:
+    """
+    Prometheus metrics in the text format. With several uvicorn workers PROMETHEUS_MULTIPROC_DIR must be set,
+    so every scrape collects the metrics of all worker processes instead of whichever one answers.
+    """
+    registry = REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
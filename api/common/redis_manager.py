@@ -1,52 +1,183 @@
+import asyncio
 import datetime
 import hashlib
 import hmac
+import json
 import secrets
-from typing import Any, Dict, List, Optional, cast
+import time
+from collections import Counter
+from typing import Any, Awaitable, Dict, List, Optional, cast
 
 import redis
+import redis.asyncio
+from cachetools import TTLCache
 from redis import Redis
 
 from common.config import settings
 from common.logger import logger
-from common.schemas import APIKeyPublic, QueuePosition
+from common.schemas import APIKeyPublic, APIKeyUsage, QueuePosition
+
+KEY_USAGE_FLUSH_SECONDS = 10
+# Ids missing from the queue index are scanned for at most once in this window, see get_queue_position
+QUEUE_SCAN_MISS_SECONDS = 300
 
 _redis_client = redis.from_url(settings.celery_broker_url, decode_responses=True)
+# Used by async routes and dependencies so Redis latency never blocks the event loop
+_async_redis_client = redis.asyncio.from_url(settings.celery_broker_url, decode_responses=True)
 
 
 class RedisManager:
     def __init__(self):
         self.client: Redis = _redis_client
+        self.async_client: redis.asyncio.Redis = _async_redis_client
         self.prefix = "DDIFFUSION_API_KEY"
-        # Register once at startup - see get_queue_position
-        self._pos_script = self.client.register_script(
-            """
+        self.key_names_key = "DDIFFUSION_API_KEY_NAMES"
+        self.key_ids_key = "DDIFFUSION_API_KEY_IDS"
+        self.key_index_marker = "DDIFFUSION_API_KEY_INDEXED"
+        self.key_usage_prefix = "DDIFFUSION_API_KEY_USAGE"
+        self.key_revoked_channel = "DDIFFUSION_KEY_REVOKED"
+        # NOTE key names must stay aligned with workers/common/redis_manager.py
+        self.affinity_prefix = "DDIFFUSION_AFFINITY"
+        self.worker_queues_key = "DDIFFUSION_WORKER_QUEUES"
+        self.blob_gc_lock_key = "DDIFFUSION_BLOB_GC"
+        self.queue_index_prefix = "DDIFFUSION_QUEUE_INDEX"
+        self.queue_sequence_key = "DDIFFUSION_QUEUE_SEQUENCE"
+        self.queue_scan_miss_prefix = "DDIFFUSION_QUEUE_SCAN_MISS"
+        self.task_events_prefix = "DDIFFUSION_TASK_EVENTS"
+        self.key_events_prefix = "DDIFFUSION_KEY_EVENTS"
+        self.task_logs_prefix = "DDIFFUSION_TASK_LOGS"
+        self.task_info_prefix = "DDIFFUSION_TASK_INFO"
+        self.base_queues = ["gpu", "cpu", "comfy"]
+        # Verified tokens by digest, only trusted while this process listens for revocations - see verify_token_async
+        self._token_cache: TTLCache = TTLCache(
+            maxsize=settings.token_cache_max_size, ttl=max(settings.token_cache_ttl_seconds, 1)
+        )
+        self._revocation_listener: Optional[asyncio.Task] = None
+        self._revocations_subscribed = False
+        # Bumped on every revocation, a lookup that overlaps one is not cached as it may have read the revoked key
+        self._revocation_count = 0
+        # Request counts are batched in memory and flushed periodically - see record_key_usage
+        self._key_usage: Counter = Counter()
+        self._key_index_ready = False
+        # Register once at startup - fallback for tasks missing from the queue index, see get_queue_position
+        # A task found by the scan is indexed between its neighbours, so later polls use the index
+        pos_script = """
             local tasks = redis.call('LRANGE', KEYS[1], 0, -1)
             local total = #tasks
             for i, task in ipairs(tasks) do
                 if string.find(task, ARGV[1], 1, true) then
                     -- FIFO correction: The tail of the list is position 1
-                    return {total - i + 1, total}
+                    local position = total - i + 1
+                    local rank = position - 1
+                    local ahead = {}
+                    if rank > 0 then
+                        ahead = redis.call('ZRANGE', KEYS[2], rank - 1, rank - 1, 'WITHSCORES')
+                    end
+                    local behind = redis.call('ZRANGE', KEYS[2], rank, rank, 'WITHSCORES')
+                    local score = 0
+                    if #ahead > 0 and #behind > 0 then
+                        score = (tonumber(ahead[2]) + tonumber(behind[2])) / 2
+                    elseif #ahead > 0 then
+                        score = tonumber(ahead[2]) + 1
+                    elseif #behind > 0 then
+                        score = tonumber(behind[2]) - 1
+                    end
+                    redis.call('ZADD', KEYS[2], tostring(score), ARGV[1])
+                    return {position, total}
                 end
             end
             return nil
         """
+        self._pos_script = self.client.register_script(pos_script)
+        self._pos_script_async = self.async_client.register_script(pos_script)
+        # Keeps the key hash, the name index and the id set consistent - see create_key and delete_key
+        self._create_key_script = self.client.register_script(
+            """
+            if redis.call('HSETNX', KEYS[1], ARGV[1], ARGV[2]) == 0 then
+                return 0
+            end
+            redis.call('HSET', KEYS[3], unpack(ARGV, 3))
+            redis.call('SADD', KEYS[2], ARGV[2])
+            return 1
+        """
+        )
+        self._delete_key_script = self.client.register_script(
+            """
+            local name = redis.call('HGET', KEYS[3], 'name')
+            if name and redis.call('HGET', KEYS[1], name) == ARGV[1] then
+                redis.call('HDEL', KEYS[1], name)
+            end
+            redis.call('SREM', KEYS[2], ARGV[1])
+            redis.call('DEL', KEYS[4])
+            return redis.call('DEL', KEYS[3])
+        """
         )
+        # Hands the backlog of a worker that went away back to the shared gpu queue - see worker_queues
+        requeue_script = """
+            local seen = redis.call('ZSCORE', KEYS[5], ARGV[1])
+            if seen and tonumber(seen) >= tonumber(ARGV[2]) then
+                return -1 -- The worker refreshed in the meantime
+            end
+            local first = redis.call('ZRANGE', KEYS[4], 0, 0, 'WITHSCORES')
+            local score = 0
+            if #first > 0 then
+                score = tonumber(first[2])
+            end
+            local moved = 0
+            -- Newest first onto the consuming end, so the oldest is consumed next and the order is kept
+            local message = redis.call('LPOP', KEYS[1])
+            while message do
+                redis.call('RPUSH', KEYS[2], message)
+                moved = moved + 1
+                local ok, body = pcall(cjson.decode, message)
+                if ok and type(body) == 'table' and type(body['headers']) == 'table' and body['headers']['id'] then
+                    score = score - 1
+                    redis.call('ZADD', KEYS[4], tostring(score), body['headers']['id'])
+                end
+                message = redis.call('LPOP', KEYS[1])
+            end
+            redis.call('DEL', KEYS[3])
+            redis.call('ZREM', KEYS[5], ARGV[1])
+            return moved
+        """
+        self._requeue_script = self.client.register_script(requeue_script)
+        self._requeue_script_async = self.async_client.register_script(requeue_script)
+
+    def acquire_blob_gc_lock(self, ttl_seconds: int) -> bool:
+        """Only one API process sweeps the blob store per interval."""
+        return bool(self.client.set(self.blob_gc_lock_key, "1", nx=True, ex=ttl_seconds))
 
     def _get_redis_key(self, key_id: str) -> str:
         return f"{self.prefix}:{key_id}"
 
-    def _name_exists(self, name: str) -> bool:
-        for key in self.client.scan_iter(f"{self.prefix}:*"):
-            if self.client.hget(key, "name") == name:
-                return True
-        return False
+    def _get_key_usage_key(self, key_id: str) -> str:
+        return f"{self.key_usage_prefix}:{key_id}"
 
-    def verify_token(self, token: str) -> Optional[APIKeyPublic]:
-        """
-        Verifies a token and returns its metadata if valid.
-        Token format: dd_<key_id>_<secret>
-        """
+    def _ensure_key_index(self):
+        """One-off backfill of the name index and id set for keys created before they existed."""
+        if self._key_index_ready:
+            return
+
+        if not self.client.exists(self.key_index_marker):
+            key_ids = [key.split(f"{self.prefix}:")[1] for key in self.client.scan_iter(f"{self.prefix}:*")]
+            pipe = self.client.pipeline()
+            for key_id in key_ids:
+                pipe.hget(self._get_redis_key(key_id), "name")
+            names = pipe.execute()
+
+            pipe = self.client.pipeline()
+            for key_id, name in zip(key_ids, names):
+                if name:
+                    pipe.hsetnx(self.key_names_key, name, key_id)
+                    pipe.sadd(self.key_ids_key, key_id)
+            pipe.set(self.key_index_marker, "1")
+            pipe.execute()
+            logger.info(f"Indexed {len(key_ids)} existing API keys")
+
+        self._key_index_ready = True
+
+    def _parse_token(self, token: str) -> Optional[tuple[str, str]]:
+        """Token format: dd_<key_id>_<secret>"""
         if not token.startswith("dd_"):
             return None
 
@@ -54,14 +185,12 @@ class RedisManager:
         if len(parts) != 3:
             return None
 
-        key_id, secret = parts[1], parts[2]
+        return parts[1], parts[2]
 
-        # Let RedisError bubble up to the global handler (500 error)
-        data = self.client.hgetall(self._get_redis_key(key_id))
-        if not data:
+    def _check_key_data(self, key_id: str, secret: str, key_data: Dict) -> Optional[APIKeyPublic]:
+        if not key_data:
             return None
 
-        key_data = cast(Dict, data)
         # Verify the secret against the stored hash and salt
         salt = key_data.get("salt")
         stored_hash = key_data.get("hash")
@@ -83,9 +212,81 @@ class RedisManager:
 
         return None
 
+    def verify_token(self, token: str) -> Optional[APIKeyPublic]:
+        """
+        Verifies a token and returns its metadata if valid.
+        Token format: dd_<key_id>_<secret>
+        """
+        parsed = self._parse_token(token)
+        if not parsed:
+            return None
+
+        key_id, secret = parsed
+        # Let RedisError bubble up to the global handler (500 error)
+        data = self.client.hgetall(self._get_redis_key(key_id))
+        return self._check_key_data(key_id, secret, cast(Dict, data))
+
+    async def verify_token_async(self, token: str) -> Optional[APIKeyPublic]:
+        """
+        Non-blocking verify_token, used by the auth dependency on every request.
+        Verified tokens are cached in memory for a short time. delete_key publishes revocations to every
+        API process, and the cache is bypassed whenever this process is not subscribed to them.
+        """
+        use_cache = settings.token_cache_ttl_seconds > 0
+        if use_cache:
+            self._ensure_revocation_listener()
+            cache_key = hashlib.sha256(token.encode()).hexdigest()
+            cached = self._token_cache.get(cache_key) if self._revocations_subscribed else None
+            if cached:
+                return cached
+
+        parsed = self._parse_token(token)
+        if not parsed:
+            return None
+
+        key_id, secret = parsed
+        revocation_count = self._revocation_count
+        data = await cast(Awaitable[dict], self.async_client.hgetall(self._get_redis_key(key_id)))
+        key = self._check_key_data(key_id, secret, data)
+
+        if use_cache and key and self._revocations_subscribed and revocation_count == self._revocation_count:
+            self._token_cache[cache_key] = key
+        return key
+
+    def _ensure_revocation_listener(self):
+        if self._revocation_listener is None or self._revocation_listener.done():
+            self._revocation_listener = asyncio.get_running_loop().create_task(self._listen_for_revocations())
+
+    async def _listen_for_revocations(self):
+        pubsub = self.async_client.pubsub()
+        try:
+            await pubsub.subscribe(self.key_revoked_channel)
+            self._revocations_subscribed = True
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    self._revocation_count += 1
+                    self._evict_cached_key(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Key revocation listener stopped, token cache disabled until it reconnects: {e}")
+        finally:
+            # Cached tokens can not be trusted while revocations may be missed
+            self._revocations_subscribed = False
+            self._revocation_count += 1
+            self._token_cache.clear()
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
+
+    def _evict_cached_key(self, key_id: str):
+        for cache_key, key in list(self._token_cache.items()):
+            if key.key_id == key_id:
+                self._token_cache.pop(cache_key, None)
+
     def create_key(self, name: str) -> str:
-        if self._name_exists(name):
-            raise ValueError("Key name already exists")
+        self._ensure_key_index()
 
         # Replace underscores with hyphens so the dd_ID_SECRET format
         # can be parsed unambiguously using split("_")
@@ -95,57 +296,354 @@ class RedisManager:
 
         hashed = hashlib.sha256((secret + salt).encode()).hexdigest()
 
-        self.client.hset(
-            self._get_redis_key(key_id),
-            mapping={
-                "name": name,
-                "hash": hashed,
-                "salt": salt,
-                "created_at": datetime.datetime.utcnow().isoformat(),
-            },
+        mapping = {
+            "name": name,
+            "hash": hashed,
+            "salt": salt,
+            "created_at": datetime.datetime.utcnow().isoformat(),
+        }
+        created = self._create_key_script(
+            keys=[self.key_names_key, self.key_ids_key, self._get_redis_key(key_id)],
+            args=[name, key_id, *[item for field in mapping.items() for item in field]],
         )
+        if not created:
+            raise ValueError("Key name already exists")
+
         return f"dd_{key_id}_{secret}"
 
-    def list_keys(self) -> List[APIKeyPublic]:
-        keys = []
-        for key in self.client.scan_iter(f"{self.prefix}:*"):
-            data = self.client.hgetall(key)
-            key_data = cast(Dict, data)
+    def list_keys(self) -> List[APIKeyUsage]:
+        self._ensure_key_index()
 
-            key_id = key.split(f"{self.prefix}:")[1]
+        key_ids = sorted(cast(set, self.client.smembers(self.key_ids_key)))
+        pipe = self.client.pipeline()
+        for key_id in key_ids:
+            pipe.hgetall(self._get_redis_key(key_id))
+            pipe.hgetall(self._get_key_usage_key(key_id))
+        results = pipe.execute()
+
+        keys = []
+        for key_id, key_data, usage in zip(key_ids, results[0::2], results[1::2]):
+            if not key_data:
+                continue
 
             keys.append(
-                APIKeyPublic(
+                APIKeyUsage(
                     key_id=key_id,
                     name=key_data.get("name", "unknown"),
                     created_at=key_data.get("created_at", ""),
+                    requests=int(usage.get("requests", 0)),
+                    tasks=int(usage.get("tasks", 0)),
+                    last_used_at=usage.get("last_used_at", ""),
                 )
             )
         return keys
 
     def delete_key(self, key_id: str) -> bool:
-        """Permanently delete the key from Redis."""
-        key = self._get_redis_key(key_id)
-        return bool(self.client.delete(key))
+        """Permanently delete the key from Redis and evict it from the token cache of every API process."""
+        self._ensure_key_index()
+
+        deleted = self._delete_key_script(
+            keys=[
+                self.key_names_key,
+                self.key_ids_key,
+                self._get_redis_key(key_id),
+                self._get_key_usage_key(key_id),
+            ],
+            args=[key_id],
+        )
+        self.client.publish(self.key_revoked_channel, key_id)
+        return bool(deleted)
 
-    def waiting_tasks(self, queues=["gpu", "cpu", "comfy"]) -> int:
+    def record_key_usage(self, key_id: str):
+        """
+        Counts an authenticated request for the key. Counts are batched in memory and written by
+        flush_key_usage, so the hot path does not pay a Redis round trip.
+        """
+        self._key_usage[key_id] += 1
+
+    async def flush_key_usage(self):
+        """Writes the batched request counts. Failed writes are kept for the next flush."""
+        if not self._key_usage:
+            return
+
+        usage, self._key_usage = self._key_usage, Counter()
+        last_used_at = datetime.datetime.utcnow().isoformat()
+        try:
+            pipe = self.async_client.pipeline()
+            for key_id, count in usage.items():
+                pipe.hincrby(self._get_key_usage_key(key_id), "requests", count)
+                pipe.hset(self._get_key_usage_key(key_id), "last_used_at", last_used_at)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to record API key usage: {e}")
+            self._key_usage.update(usage)
+
+    async def flush_key_usage_periodically(self):
+        """Runs for the lifetime of the app, see the lifespan in main.py."""
+        while True:
+            await asyncio.sleep(KEY_USAGE_FLUSH_SECONDS)
+            await self.flush_key_usage()
+
+    def _stale_worker_queues(self, entries: list) -> List[str]:
+        stale_before = time.time() - settings.affinity_ttl_seconds
+        return [queue for queue, seen in entries if seen < stale_before]
+
+    @staticmethod
+    def _queue_lengths(pipe, queues: List[str]):
+        """Adds an LLEN per queue to a sync or async pipeline, shared by the sync and async variants below."""
+        for q in queues:
+            pipe.llen(q)
+        return pipe
+
+    def _requeue_args(self, queue: str) -> dict:
+        stale_before = time.time() - settings.affinity_ttl_seconds
+        keys = [queue, "gpu", self._get_queue_index_key(queue), self._get_queue_index_key("gpu")]
+        return {"keys": [*keys, self.worker_queues_key], "args": [queue, stale_before]}
+
+    @staticmethod
+    def _removed_worker_queue(queue: str, moved: Any) -> bool:
+        """Parses the requeue script result, -1 if the worker came back, otherwise the number of tasks moved."""
+        if int(moved) < 0:
+            return False
+        if int(moved) > 0:
+            logger.warning(f"Worker queue {queue} went stale, moved {moved} waiting tasks back to the gpu queue")
+        return True
+
+    @staticmethod
+    def _live_worker_queues(entries: list, removed: List[str]) -> List[str]:
+        return [queue for queue, _ in entries if queue not in removed]
+
+    def worker_queues(self) -> List[str]:
+        """
+        Returns the private gpu queues advertised by workers for affinity routing.
+        Queues of workers that went away are removed and their waiting tasks moved back to the gpu queue.
+        """
+        entries = cast(list, self.client.zrange(self.worker_queues_key, 0, -1, withscores=True))
+        removed = [
+            queue
+            for queue in self._stale_worker_queues(entries)
+            if self._removed_worker_queue(queue, self._requeue_script(**self._requeue_args(queue)))
+        ]
+        return self._live_worker_queues(entries, removed)
+
+    async def worker_queues_async(self) -> List[str]:
+        entries = cast(list, await self.async_client.zrange(self.worker_queues_key, 0, -1, withscores=True))
+        removed = [
+            queue
+            for queue in self._stale_worker_queues(entries)
+            if self._removed_worker_queue(queue, await self._requeue_script_async(**self._requeue_args(queue)))
+        ]
+        return self._live_worker_queues(entries, removed)
+
+    def get_affinity_queue(self, task_name: str) -> Optional[str]:
+        """
+        Returns the private queue of a live worker that already has the pipeline for task_name loaded.
+        Picks the shortest backlog and returns None if every warm worker is too busy.
+        """
+        fresh_after = time.time() - settings.affinity_ttl_seconds
+        queues = cast(list, self.client.zrangebyscore(f"{self.affinity_prefix}:{task_name}", fresh_after, "+inf"))
+        if not queues:
+            return None
+
+        pipe = self.client.pipeline()
+        for queue in queues:
+            pipe.llen(queue)
+        queue, length = min(zip(queues, pipe.execute()), key=lambda item: item[1])
+
+        if length >= settings.affinity_max_queue_length:
+            return None
+        return queue
+
+    def all_queues(self) -> List[str]:
+        return self.base_queues + self.worker_queues()
+
+    async def all_queues_async(self) -> List[str]:
+        return self.base_queues + await self.worker_queues_async()
+
+    def waiting_tasks(self, queues: Optional[List[str]] = None) -> int:
         """
         Returns the number of waiting tasks
         """
+        queues = queues or self.all_queues()
+        return sum(self._queue_lengths(self.client.pipeline(), queues).execute())
+
+    async def waiting_tasks_async(self, queues: Optional[List[str]] = None) -> int:
+        queues = queues or await self.all_queues_async()
+        return sum(await self._queue_lengths(self.async_client.pipeline(), queues).execute())
+
+    def get_task_events_channel(self, task_id: str) -> str:
+        return f"{self.task_events_prefix}:{task_id}"
+
+    def get_key_events_channel(self, key_id: str) -> str:
+        return f"{self.key_events_prefix}:{key_id}"
+
+    def publish_task_event(self, task_id: str, event: dict, key_id: Optional[str] = None):
+        """Publish a task event to the task channel, and to the API key channel when the key is known."""
+        message = json.dumps(event)
+        pipe = self.client.pipeline()
+        pipe.publish(self.get_task_events_channel(task_id), message)
+        if key_id:
+            pipe.publish(self.get_key_events_channel(key_id), message)
+        pipe.execute()
+
+    def _get_task_info_key(self, task_id: str) -> str:
+        return f"{self.task_info_prefix}:{task_id}"
+
+    def get_task_info(self, task_id: str) -> Dict[str, str]:
+        return cast(Dict[str, str], self.client.hgetall(self._get_task_info_key(task_id)))
 
-        waiting = sum(cast(int, self.client.llen(q)) for q in queues)
-        return waiting
+    def get_task_logs(self, task_id: str, tail: int) -> List[str]:
+        """Returns the last `tail` log lines of a task, without reading the rest of the log."""
+        return cast(List[str], self.client.lrange(f"{self.task_logs_prefix}:{task_id}", -tail, -1))
+
+    def get_tasks_logs(self, task_ids: List[str], tail: int) -> Dict[str, List[str]]:
+        """Batch version of get_task_logs in a single round trip."""
+        pipe = self.client.pipeline()
+        for task_id in task_ids:
+            pipe.lrange(f"{self.task_logs_prefix}:{task_id}", -tail, -1)
+        return dict(zip(task_ids, pipe.execute()))
+
+    def _get_queue_index_key(self, queue: str) -> str:
+        return f"{self.queue_index_prefix}:{queue}"
+
+    def index_task(self, queue: str, task_id: str, task_name: str, key_id: Optional[str] = None):
+        """
+        Records a task in the queue index before it is published, scored by a global enqueue sequence.
+        Workers remove it again when they consume the message, so the rank is the queue position.
+        Also starts the task info the workers fill in as the task runs.
+        """
+        sequence = cast(int, self.client.incr(self.queue_sequence_key))
+        info_key = self._get_task_info_key(task_id)
+        pipe = self.client.pipeline()
+        pipe.zadd(self._get_queue_index_key(queue), {task_id: sequence})
+        pipe.hset(info_key, mapping={"name": task_name, "state": "PENDING", "queue": queue, "sent": time.time()})
+        pipe.expire(info_key, settings.result_expires_days * 24 * 3600)
+        if key_id:
+            pipe.hincrby(self._get_key_usage_key(key_id), "tasks", 1)
+        pipe.execute()
+
+    def unindex_task(self, task_id: str, queues: Optional[List[str]] = None):
+        queues = queues or self.all_queues()
+        pipe = self.client.pipeline()
+        for q in queues:
+            pipe.zrem(self._get_queue_index_key(q), task_id)
+        pipe.execute()
 
-    def get_queue_position(self, task_id: str, queues=["gpu", "cpu", "comfy"]) -> Optional[QueuePosition]:
+    def get_queue_positions(self, task_ids: List[str]) -> Dict[str, QueuePosition]:
         """
-        Finds the 1-based position of a task logic inside Redis using Lua.
-        This is MUCH faster because it avoids pulling large task payloads (Base64 images)
-        over the network to the API.
+        Batch version of get_queue_position in a single round trip, using the queue index only.
+        Tasks missing from the index are left out rather than scanning the queues for each of them.
         """
+        queues = self.all_queues()
+
+        pipe = self.client.pipeline()
+        for q in queues:
+            pipe.llen(q)
+            for task_id in task_ids:
+                pipe.zrank(self._get_queue_index_key(q), task_id)
+        results = iter(pipe.execute())
+
+        positions: Dict[str, QueuePosition] = {}
+        for q in queues:
+            length = next(results)
+            for task_id in task_ids:
+                rank = next(results)
+                if rank is not None and length > 0 and task_id not in positions:
+                    positions[task_id] = QueuePosition(position=min(rank, length - 1) + 1, queue=q, total=length)
+        return positions
+
+    def _queue_index_commands(self, pipe, queues: List[str], task_id: str):
+        """Adds the ZRANK and LLEN per queue resolved by _find_indexed_position to a sync or async pipeline."""
+        for q in queues:
+            pipe.zrank(self._get_queue_index_key(q), task_id)
+            pipe.llen(q)
+        return pipe
+
+    @staticmethod
+    def _find_indexed_position(
+        queues: List[str], results: list
+    ) -> tuple[Optional[QueuePosition], Optional[tuple[str, int]]]:
+        """
+        Resolves the pipelined ZRANK and LLEN results of get_queue_position.
+        The list is the source of truth, entries ahead of the task beyond its length were consumed without
+        being removed (e.g. a worker was killed), so the index range to trim is also returned to keep it bounded.
+        """
+        for q, rank, length in zip(queues, results[0::2], results[1::2]):
+            if rank is None:
+                continue
+            if rank < length:
+                return QueuePosition(position=rank + 1, queue=q, total=length), None
+
+            trim = (q, rank - length)
+            if length == 0:
+                return None, trim
+            return QueuePosition(position=length, queue=q, total=length), trim
+        return None, None
+
+    def _get_scan_miss_key(self, task_id: str) -> str:
+        return f"{self.queue_scan_miss_prefix}:{task_id}"
+
+    def _scan_args(self, queue: str, task_id: str) -> dict:
+        return {"keys": [queue, self._get_queue_index_key(queue)], "args": [task_id]}
+
+    @staticmethod
+    def _scanned_position(queue: str, result: Any) -> Optional[QueuePosition]:
+        """Parses the position script result, a [position, total] pair or nil."""
+        if not result:
+            return None
+        result = cast(list, result)
+        return QueuePosition(position=result[0], queue=queue, total=result[1])
+
+    def get_queue_position(self, task_id: str, queues: Optional[List[str]] = None) -> Optional[QueuePosition]:
+        """
+        Finds the 1-based position of a task from the queue index in O(log n) without touching the payloads.
+        Tasks missing from the index (published before it existed or requeued after a worker was lost)
+        fall back to scanning the queue using Lua, which indexes them when found. Ids the scan did not find,
+        such as unknown or expired ones, are not scanned for again for QUEUE_SCAN_MISS_SECONDS.
+        """
+        queues = queues or self.all_queues()
+
+        results = self._queue_index_commands(self.client.pipeline(), queues, task_id).execute()
+        position, trim = self._find_indexed_position(queues, results)
+
+        if trim:
+            self.client.zremrangebyrank(self._get_queue_index_key(trim[0]), 0, trim[1])
+        if position:
+            return position
+
+        miss_key = self._get_scan_miss_key(task_id)
+        if not self.client.set(miss_key, "1", nx=True, ex=QUEUE_SCAN_MISS_SECONDS):
+            return None
+
+        for q in queues:
+            position = self._scanned_position(q, self._pos_script(**self._scan_args(q, task_id)))
+            if position:
+                self.client.delete(miss_key)
+                return position
+        return None
+
+    async def get_queue_position_async(
+        self, task_id: str, queues: Optional[List[str]] = None
+    ) -> Optional[QueuePosition]:
+        queues = queues or await self.all_queues_async()
+
+        results = await self._queue_index_commands(self.async_client.pipeline(), queues, task_id).execute()
+        position, trim = self._find_indexed_position(queues, results)
+
+        if trim:
+            await self.async_client.zremrangebyrank(self._get_queue_index_key(trim[0]), 0, trim[1])
+        if position:
+            return position
+
+        miss_key = self._get_scan_miss_key(task_id)
+        if not await self.async_client.set(miss_key, "1", nx=True, ex=QUEUE_SCAN_MISS_SECONDS):
+            return None
+
         for q in queues:
-            result = cast(list, self._pos_script(keys=[q], args=[task_id]))
-            if result:
-                return QueuePosition(position=result[0], queue=q, total=result[1])
+            position = self._scanned_position(q, await self._pos_script_async(**self._scan_args(q, task_id)))
+            if position:
+                await self.async_client.delete(miss_key)
+                return position
         return None
 
 
@@ -27,6 +27,9 @@ class TaskStatus(str, Enum):
 MB_SIZE = 1024 * 1024
 MAX_BASE64_SIZE = MB_SIZE * 100
 
+# Inputs uploaded to /api/blobs can be passed as "blob:<sha256>" anywhere base64 data is accepted
+BLOB_REF_PREFIX = "blob:"
+
 Provider: TypeAlias = Literal["local", "openai", "replicate"]
 
 Base64Image = Annotated[
@@ -72,6 +75,18 @@ class APIKeyPublic(BaseModel):
     created_at: str
 
 
+class APIKeyUsage(APIKeyPublic):
+    requests: int = Field(default=0, description="Authenticated requests made with the key, flushed every few seconds")
+    tasks: int = Field(default=0, description="Tasks created with the key")
+    last_used_at: str = ""
+
+
+class BlobResponse(BaseModel):
+    id: str = Field(description="sha256 of the blob content")
+    ref: str = Field(description="Reference to pass in place of base64 data")
+    size: int = Field(description="Size of the blob in bytes")
+
+
 class QueuePosition(BaseModel):
     position: int = Field(description="1-based position in the queue")
     queue: str = Field(description="Name of the queue")
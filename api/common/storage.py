@@ -1,12 +1,18 @@
 import hashlib
 import hmac
+import os
+import re
 import time
+import uuid
 from pathlib import Path
+from typing import Any, AsyncIterator
 
 from pydantic import HttpUrl
 
 from common.config import settings
 from common.logger import logger
+from common.schemas import BLOB_REF_PREFIX, MAX_BASE64_SIZE
+from common.storage_backends import LocalStorage, S3Storage, StorageBackend
 
 
 def _get_signature(file_id: str, method: str, expires: int) -> str:
@@ -45,12 +51,112 @@ def verify_signed_url(file_id: str, method: str, expires: int, sig: str) -> bool
     return hmac.compare_digest(sig, expected)
 
 
+def _create_storage_backend() -> StorageBackend:
+    if settings.storage_backend == "s3":
+        return S3Storage(
+            settings.s3_bucket,
+            endpoint_url=settings.s3_endpoint_url,
+            region=settings.s3_region,
+            public_endpoint_url=settings.s3_public_endpoint_url,
+        )
+
+    return LocalStorage(
+        settings.storage_dir, signer=lambda file_id, expires_in: str(generate_signed_url(file_id, "GET", expires_in))
+    )
+
+
+storage_backend = _create_storage_backend()
+
+
 def signed_url_for_file(file_id: str) -> HttpUrl:
     """
-    Generates a signed URL for a given file ID.
+    Generates a signed URL for a given file ID. Local files are served by the files router,
+    with the s3 backend the URL is presigned by the bucket and downloads skip the API entirely.
+    """
+    return HttpUrl(storage_backend.presign(file_id, settings.signed_url_expiry_seconds))
+
+
+class BlobTooLargeError(ValueError):
+    pass
+
+
+def get_blob_path(blob_id: str) -> Path:
+    """Content addressed location of an uploaded input, raises ValueError for anything but a sha256."""
+    if not re.fullmatch(r"[0-9a-f]{64}", blob_id):
+        raise ValueError(f"Invalid blob id: {blob_id}")
+
+    return Path(settings.storage_dir) / "blobs" / blob_id[:2] / blob_id
+
+
+async def save_blob(chunks: AsyncIterator[bytes]) -> tuple[str, int]:
     """
-    full_path = Path(settings.storage_dir) / Path(file_id)
-    if full_path.exists() is False:
-        raise FileNotFoundError(f"File not found for signed URL generation: {full_path}")
+    Streams an upload to storage while hashing it, so large inputs are never held in memory.
+    Returns (sha256, size), raises ValueError if the upload is empty or too large.
+    """
+    blobs_dir = Path(settings.storage_dir) / "blobs"
+    blobs_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = blobs_dir / f".{uuid.uuid4().hex}.tmp"
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > MAX_BASE64_SIZE:
+                    raise BlobTooLargeError(f"Blob exceeds {MAX_BASE64_SIZE} bytes")
+                digest.update(chunk)
+                f.write(chunk)
+
+        if size == 0:
+            raise ValueError("Blob is empty")
+
+        blob_id = digest.hexdigest()
+        blob_path = get_blob_path(blob_id)
+        if blob_path.is_file():
+            blob_path.touch()  # Already stored, only refresh its last use
+        else:
+            blob_path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_path, blob_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+    logger.info(f"Stored blob {blob_id} ({size} bytes)")
+    return blob_id, size
+
+
+def touch_blob_refs(payload: Any) -> list[str]:
+    """
+    Refreshes the last use of every blob referenced in a request payload, which keeps it from being garbage
+    collected while tasks still need it. Returns the references that do not resolve to an uploaded blob.
+    """
+    if isinstance(payload, dict):
+        return [ref for value in payload.values() for ref in touch_blob_refs(value)]
+    if isinstance(payload, list):
+        return [ref for value in payload for ref in touch_blob_refs(value)]
+    if isinstance(payload, str) and payload.startswith(BLOB_REF_PREFIX):
+        try:
+            os.utime(get_blob_path(payload[len(BLOB_REF_PREFIX) :]))
+            return []
+        except (ValueError, FileNotFoundError):
+            return [payload]
+    return []
+
+
+def collect_expired_blobs() -> int:
+    """Deletes blobs no request has used within result_expires_days, returns the number removed."""
+    blobs_dir = Path(settings.storage_dir) / "blobs"
+    cutoff = time.time() - settings.result_expires_days * 24 * 60 * 60
+    removed = 0
+
+    # Includes temp files left behind by interrupted uploads
+    for path in [*blobs_dir.glob("*/*"), *blobs_dir.glob(".*.tmp")]:
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            continue  # Removed by another process
 
-    return generate_signed_url(file_id, method="GET", expires_in=settings.signed_url_expiry_seconds)
+    logger.info(f"Blob garbage collection removed {removed} blobs")
+    return removed
@@ -1,73 +1,111 @@
+import time
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional
-from uuid import UUID
+from typing import Any, Dict, List, Optional, Union
+from uuid import UUID, uuid4
 
-import httpx
-from cachetools import TTLCache, cached
+from celery import states
 from celery.result import AsyncResult
 from fastapi import HTTPException
+from pydantic import HttpUrl
 
 from common.config import settings
 from common.logger import logger
+from common.metrics import span
 from common.redis_manager import redis_manager
-from common.schemas import DeleteResponse, Identity, TaskStatus
+from common.schemas import DeleteResponse, Identity, QueuePosition, TaskStatus
+from common.storage import signed_url_for_file, touch_blob_refs
 from worker import celery_app
 
+TASK_INFO_TIMESTAMPS = ["sent", "received", "started", "succeeded", "failed", "revoked"]
+
 
-@cached(cache=TTLCache(maxsize=128, ttl=5))
 def _get_task_info(task_id: str) -> Dict[str, Any]:
     """
-    Fetch task information from Flower API.
-    So we can use this to provide more detailed task status in the API responses.
-    Instead of using celerys extended results feature which would use a lot of storage.
+    Task metadata (timings, worker, queue) recorded in Redis by the API and the workers.
+    So we can provide more detailed task status in the API responses,
+    instead of using celerys extended results feature which would use a lot of storage.
     """
-    result = {}
     try:
-        url = f"{settings.flower_url}/api/task/info/{task_id}"
-        with httpx.Client() as client:
-            response = client.get(url, timeout=5.0)
-            response.raise_for_status()
-            if response.status_code == 200:
-                result = response.json()
+        info: Dict[str, Any] = dict(redis_manager.get_task_info(task_id))
     except Exception as e:
-        logger.warning(f"Error fetching task info from Flower: {e}")
+        logger.warning(f"Error fetching task info: {e}")
         return {}
 
-    # Remove any empty or null fields
-    result = {k: v for k, v in result.items() if v not in [None, "", [], {}]}
-
-    # Always remove these fields
-    exclude_keys = ["root", "root_id", "parent", "parent_id", "children", "result", "uuid", "clock"]
-    for key in exclude_keys:
-        result.pop(key, None)
-
     # Convert timestamps to ISO datetime strings
-    timestamp_keys = ["received", "sent", "started", "rejected", "succeeded", "timestamp"]
-    for key in timestamp_keys:
-        if key in result and isinstance(result[key], (int, float)):
+    for key in TASK_INFO_TIMESTAMPS:
+        if key in info:
             try:
-                result[key] = datetime.fromtimestamp(result[key], tz=timezone.utc).isoformat(timespec="seconds")
+                info[key] = datetime.fromtimestamp(float(info[key]), tz=timezone.utc).isoformat(timespec="seconds")
             except (ValueError, OverflowError, TypeError):
                 # Use original value if conversion fails
                 pass
 
-    # NOTE possibly we could put into a fixed schema here instead of returning raw dict
-    return result
+    for key in ["runtime", "retries"]:
+        if key in info:
+            try:
+                info[key] = float(info[key]) if key == "runtime" else int(info[key])
+            except ValueError:
+                pass
+
+    return info
 
 
 def create_task(task_name: str, task_queue: str, payload: dict, identity: Identity) -> AsyncResult:
     """
     Unified helper to create a task in Celery.
+    GPU tasks are routed to a worker that already has the pipeline loaded when affinity routing is enabled.
     """
-    try:
-        return celery_app.send_task(
-            task_name,
-            queue=task_queue,
-            args=[payload],
-            kwargs=identity.model_dump(),
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error creating task: {str(e)}")
+    with span(task_name, "input"):
+        missing_blobs = touch_blob_refs(payload)
+    if missing_blobs:
+        raise HTTPException(status_code=400, detail=f"Blob not found, upload it to /api/blobs first: {missing_blobs}")
+
+    queue = task_queue
+    if task_queue == "gpu" and settings.enable_affinity_routing:
+        with span(task_name, "routing"):
+            try:
+                queue = redis_manager.get_affinity_queue(task_name) or task_queue
+            except Exception as e:
+                logger.warning(f"Affinity lookup failed, using shared queue: {e}")
+
+    with span(task_name, "enqueue"):
+        # Index before publishing so a fast worker can never consume the task before it is indexed
+        task_id = str(uuid4())
+        try:
+            redis_manager.index_task(queue, task_id, task_name, identity.key_id)
+        except Exception as e:
+            logger.warning(f"Failed to index task {task_id} on {queue}: {e}")
+
+        try:
+            return celery_app.send_task(
+                task_name,
+                task_id=task_id,
+                queue=queue,
+                args=[payload],
+                kwargs=identity.model_dump(),
+                # used by the workers to bound gpu batching reorders and to time the queue wait
+                headers={"enqueued_at": time.time()},
+            )
+        except Exception as e:
+            redis_manager.unindex_task(task_id, [queue])
+            raise HTTPException(status_code=500, detail=f"Error creating task: {str(e)}")
+
+
+def format_queue_position(position: QueuePosition) -> str:
+    return f"Queue {position.queue} position: {position.position} / {position.total}"
+
+
+def get_task_output(result: Any) -> Union[List[HttpUrl], str, None]:
+    """The output of a successful task, file outputs are converted to signed URLs."""
+    if not isinstance(result, dict):
+        return None
+
+    output = result.get("output")
+    if isinstance(output, list):
+        return [signed_url_for_file(file_id) for file_id in output]
+
+    # Text tasks return the generated text as the response
+    return result.get("response", output)
 
 
 def get_task_detailed(id: UUID) -> tuple[AsyncResult, dict, list[str]]:
@@ -83,7 +121,7 @@ def get_task_detailed(id: UUID) -> tuple[AsyncResult, dict, list[str]]:
         """
         pos_data = redis_manager.get_queue_position(task_id)
         if pos_data:
-            return f"Queue {pos_data.queue} position: {pos_data.position} / {pos_data.total}"
+            return format_queue_position(pos_data)
 
         return None
 
@@ -100,17 +138,55 @@ def get_task_detailed(id: UUID) -> tuple[AsyncResult, dict, list[str]]:
         # Keep the queue position logs to return to the user
         logs = [queue_position]
     else:
-        # get the running logs of the task if available
-        if result.info:
-            if isinstance(result.info, dict):
-                logs = result.info.get("logs", [])
+        # Workers append running logs to a capped list, only the tail is read
+        logs = redis_manager.get_task_logs(str(id), settings.task_log_tail_lines)
+        if not logs and isinstance(result.info, dict):
+            logs = result.info.get("logs", [])
 
-    # Enrich with Flower metadata if available (metrics, worker info, etc)
+    # Enrich with the task metadata if available (timings, worker info, etc)
     task_info = _get_task_info(str(id))
 
     return result, task_info, logs
 
 
+def get_task_metas(task_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Reads the stored results of many tasks with a single MGET against the Celery result backend.
+    Returns None for tasks without a stored state, that is waiting or unknown tasks.
+    """
+    backend = celery_app.backend
+    raw_metas = backend.client.mget([backend.get_key_for_task(task_id) for task_id in task_ids])
+
+    metas: List[Optional[Dict[str, Any]]] = []
+    for raw in raw_metas:
+        if raw is None:
+            metas.append(None)
+            continue
+
+        meta = backend.decode_result(raw)
+        if meta["status"] in states.EXCEPTION_STATES:
+            meta["result"] = backend.exception_to_python(meta["result"])
+        metas.append(meta)
+    return metas
+
+
+def get_task_event(task_id: str) -> Dict[str, Any]:
+    """
+    Builds the status event pushed to streaming clients.
+    Finished tasks include their output, with file outputs converted to signed URLs.
+    """
+    result = AsyncResult(task_id, app=celery_app)
+    event: Dict[str, Any] = {"type": "status", "id": task_id, "status": result.status}
+
+    if result.successful():
+        output = get_task_output(result.result)
+        event["output"] = [str(url) for url in output] if isinstance(output, list) else output
+    elif result.failed():
+        event["error_message"] = f"Task failed with error: {str(result.result)}"
+
+    return event
+
+
 def cancel_task(id: UUID) -> DeleteResponse:
     result = AsyncResult(str(id), app=celery_app)
 
@@ -119,7 +195,12 @@ def cancel_task(id: UUID) -> DeleteResponse:
 
     try:
         celery_app.control.revoke(str(id), terminate=True)
-        # result.forget()  # Optional: removes result from backend/Flower after revoke
+        # Workers discard revoked messages without reporting them as received
+        redis_manager.unindex_task(str(id))
+        redis_manager.publish_task_event(
+            str(id), {"type": "status", "id": str(id), "status": TaskStatus.REVOKED.value}
+        )
+        # result.forget()  # Optional: removes result from backend after revoke
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error cancelling task: {str(e)}")
 
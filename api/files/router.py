@@ -1,6 +1,9 @@
+import os
+import time
 from pathlib import Path
+from typing import Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Response
 from fastapi.responses import FileResponse
 
 from common.config import settings
@@ -9,8 +12,23 @@ from common.storage import verify_signed_url
 router = APIRouter(prefix="/files", tags=["files"])
 
 
+def _get_etag(user_path: Path, stat_result: os.stat_result) -> str:
+    """
+    Strong validator for the file. Uploaded blobs are content addressed so their name is the content hash,
+    task outputs are written once so size and modification time identify the content.
+    """
+    if user_path.parts[:1] == ("blobs",):
+        return f'"{user_path.name}"'
+    return f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+
+
+def _etag_matches(etag: str, if_none_match: str) -> bool:
+    candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
 @router.get("/{file_id:path}", operation_id="files_get")
-async def get(file_id: str, expires: int, sig: str):
+async def get(file_id: str, expires: int, sig: str, if_none_match: Optional[str] = Header(default=None)):
     if not verify_signed_url(file_id, "GET", expires, sig):
         raise HTTPException(status_code=403, detail="Invalid or expired signature")
 
@@ -29,4 +47,14 @@ async def get(file_id: str, expires: int, sig: str):
     if not full_path.is_file():
         raise HTTPException(status_code=404, detail=f"File not found: {file_id}")
 
-    return FileResponse(str(full_path))
+    stat_result = full_path.stat()
+    # Files never change once written, clients can cache them for as long as the signed URL is valid
+    headers = {
+        "ETag": _get_etag(user_path, stat_result),
+        "Cache-Control": f"private, max-age={max(expires - int(time.time()), 0)}, immutable",
+    }
+    if if_none_match and _etag_matches(headers["ETag"], if_none_match):
+        return Response(status_code=304, headers=headers)
+
+    # Range and If-Range requests are answered with partial content by FileResponse
+    return FileResponse(str(full_path), headers=headers, stat_result=stat_result)
@@ -298,6 +298,7 @@ class ImageRequest(BaseModel):
 class ImageWorkerResponse(BaseModel):
     output: List[str]
     logs: List[str]
+    timings: Dict[str, float] = {}  # Seconds spent in each stage of the task, recorded by the worker
 
 
 class ImageResponse(BaseModel):
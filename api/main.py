@@ -1,22 +1,42 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, RedirectResponse
 from fastmcp import FastMCP
+from fastmcp.server.openapi import MCPType, RouteMap
 
 from admin import router as admin
+from blobs import router as blobs
 from common.config import settings
 from common.logger import logger
+from common.metrics import metrics_response
+from common.redis_manager import redis_manager
 from files import router as files
 from images import router as images
+from tasks import router as tasks
 from texts import router as texts
 from utils.utils import truncate_strings
 from videos import router as videos
 from workflows import router as workflows
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # API key request counts are batched in memory, write them on a timer and once more at shutdown
+    flusher = asyncio.create_task(redis_manager.flush_key_usage_periodically())
+    try:
+        yield
+    finally:
+        flusher.cancel()
+        await redis_manager.flush_key_usage()
+
+
 # NOTE imporant keep name API as clients will use the title
-fastapi_app = FastAPI(title="API")
+fastapi_app = FastAPI(title="API", lifespan=lifespan)
 
 
 fastapi_app.include_router(images.router, prefix="/api")
@@ -24,6 +44,8 @@ fastapi_app.include_router(texts.router, prefix="/api")
 fastapi_app.include_router(videos.router, prefix="/api")
 fastapi_app.include_router(workflows.router, prefix="/api")
 fastapi_app.include_router(files.router, prefix="/api")
+fastapi_app.include_router(blobs.router, prefix="/api")
+fastapi_app.include_router(tasks.router, prefix="/api")
 fastapi_app.include_router(admin.router, prefix="/api")
 
 
@@ -37,12 +59,20 @@ def health():
     return {"status": "healthy"}
 
 
+if settings.enable_metrics:
+
+    @fastapi_app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return metrics_response()
+
+
 # Combine mcp and fastapi
 if settings.enable_mcp:
     # NOTE possibly there is a way to not spin up two servers, but this is the easiest way for now
     mcp = FastMCP.from_fastapi(
         app=fastapi_app,
         name="MCP",
+        route_maps=[RouteMap(pattern=r"/events$", mcp_type=MCPType.EXCLUDE)],  # streams never return to a tool call
         httpx_client_kwargs={  # NOTE required hint for authenticated MCP calls
             "headers": {
                 "Authorization": "Bearer secret-token",
@@ -51,12 +81,18 @@ if settings.enable_mcp:
     )
 
     mcp_app = mcp.http_app(path="/mcp", transport="streamable-http", stateless_http=True)
+
+    @asynccontextmanager
+    async def combined_lifespan(app: FastAPI):
+        async with lifespan(app), mcp_app.lifespan(app):
+            yield
+
     app = FastAPI(
         routes=[
             *fastapi_app.routes,
             *mcp_app.routes,
         ],
-        lifespan=mcp_app.lifespan,
+        lifespan=combined_lifespan,
     )
 else:
     app = fastapi_app
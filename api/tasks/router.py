@@ -0,0 +1,162 @@
+import json
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Union
+from uuid import UUID
+
+from celery import states
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from common.auth import verify_token_no_backlog
+from common.config import settings
+from common.redis_manager import redis_manager
+from common.schemas import Identity, TaskStatus
+from common.task_helpers import (
+    format_queue_position,
+    get_task_event,
+    get_task_metas,
+    get_task_output,
+)
+from tasks.schemas import TaskStatusItem, TaskStatusRequest, TaskStatusResponse
+
+router = APIRouter(prefix="/tasks", tags=["Tasks"], dependencies=[Depends(verify_token_no_backlog)])
+
+KEEP_ALIVE_SECONDS = 15
+
+EVENT_STREAM_RESPONSES: Dict[Union[int, str], Dict[str, Any]] = {
+    200: {
+        "description": (
+            "Server-sent events. `status` events carry the task status, plus `output` or `error_message` once "
+            "the task has finished. `log` events carry the task log lines as they are written."
+        ),
+        "content": {"text/event-stream": {"schema": {"type": "string"}}},
+    }
+}
+
+
+def _format_event(event: dict) -> str:
+    return f"event: {event.get('type', 'message')}\ndata: {json.dumps(event)}\n\n"
+
+
+async def _event_stream(request: Request, channel: str, initial: Optional[dict] = None) -> AsyncIterator[str]:
+    """
+    Relays the task events the workers publish to Redis as server-sent events.
+    Finished status events are replaced by the full result so clients never need a follow-up GET.
+    A single task stream starts with the current status and closes once the task has finished.
+    """
+    pubsub = redis_manager.async_client.pubsub()
+    await pubsub.subscribe(channel)
+    try:
+        if initial:
+            # Re-read after subscribing so a change made in between is never missed
+            event = await run_in_threadpool(get_task_event, initial["id"])
+            yield _format_event(event)
+            if event["status"] in states.READY_STATES:
+                return
+
+        while not await request.is_disconnected():
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=KEEP_ALIVE_SECONDS)
+            if message is None:
+                yield ": keep-alive\n\n"
+                continue
+
+            event = json.loads(message["data"])
+            finished = event.get("type") == "status" and event.get("status") in states.READY_STATES
+            if finished:
+                event = await run_in_threadpool(get_task_event, event["id"])
+
+            yield _format_event(event)
+            if finished and initial:
+                return
+    finally:
+        await pubsub.unsubscribe(channel)
+        await pubsub.aclose()
+
+
+def _get_status_items(task_ids: List[str]) -> List[TaskStatusItem]:
+    metas = get_task_metas(task_ids)
+
+    waiting = [task_id for task_id, meta in zip(task_ids, metas) if meta is None]
+    positions = redis_manager.get_queue_positions(waiting) if waiting else {}
+
+    running = [task_id for task_id, meta in zip(task_ids, metas) if meta and meta["status"] not in states.READY_STATES]
+    running_logs = redis_manager.get_tasks_logs(running, settings.task_log_tail_lines) if running else {}
+
+    items = []
+    for task_id, meta in zip(task_ids, metas):
+        item = TaskStatusItem(id=UUID(task_id), status=TaskStatus.PENDING)
+        items.append(item)
+
+        if meta is None:
+            position = positions.get(task_id)
+            if position:
+                item.logs = [format_queue_position(position)]
+            else:
+                item.error_message = "Task not found or has expired"
+            continue
+
+        item.status = TaskStatus(meta["status"])
+        result = meta["result"]
+        if item.status == TaskStatus.SUCCESS:
+            item.output = get_task_output(result)
+            item.logs = result.get("logs", [])[-settings.task_log_tail_lines :] if isinstance(result, dict) else []
+        elif item.status == TaskStatus.FAILURE:
+            item.error_message = f"Task failed with error: {str(result)}"
+        elif task_id in running_logs:
+            item.logs = running_logs[task_id] or (result.get("logs", []) if isinstance(result, dict) else [])
+
+    return items
+
+
+def _event_stream_response(stream: AsyncIterator[str] | Iterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post(
+    "/status",
+    response_model=TaskStatusResponse,
+    operation_id="tasks_status",
+    description=(
+        "Get the status of many image, video, text or workflow tasks in one request. "
+        "Returns the status, output or error and the most recent logs of each task, in the order requested. "
+        "Unknown or expired tasks are reported as PENDING with an error message."
+    ),
+)
+def status(request: TaskStatusRequest):
+    return TaskStatusResponse(tasks=_get_status_items([str(id) for id in request.ids]))
+
+
+@router.get(
+    "/events",
+    response_class=StreamingResponse,
+    responses=EVENT_STREAM_RESPONSES,
+    operation_id="tasks_events",
+    description="Stream the events of every task created with the calling API key.",
+)
+async def events(request: Request, identity: Identity = Depends(verify_token_no_backlog)):
+    channel = redis_manager.get_key_events_channel(identity.key_id)
+    return _event_stream_response(_event_stream(request, channel))
+
+
+@router.get(
+    "/{id}/events",
+    response_class=StreamingResponse,
+    responses=EVENT_STREAM_RESPONSES,
+    operation_id="tasks_task_events",
+    description="Stream the events of a task until it has finished, replacing polling the task GET endpoint.",
+)
+async def task_events(request: Request, id: UUID):
+    task_id = str(id)
+    initial = await run_in_threadpool(get_task_event, task_id)
+    if initial["status"] == TaskStatus.PENDING:
+        if await redis_manager.get_queue_position_async(task_id) is None:
+            raise HTTPException(status_code=404, detail="Task not found or has expired")
+    elif initial["status"] in states.READY_STATES:
+        return _event_stream_response(iter([_format_event(initial)]))
+
+    channel = redis_manager.get_task_events_channel(task_id)
+    return _event_stream_response(_event_stream(request, channel, initial))
@@ -0,0 +1,59 @@
+from typing import List, Optional, Union
+from uuid import UUID
+
+from pydantic import BaseModel, ConfigDict, Field, HttpUrl
+
+from common.schemas import TaskStatus
+
+MAX_STATUS_IDS = 500
+
+
+class TaskStatusRequest(BaseModel):
+    ids: List[UUID] = Field(
+        min_length=1,
+        max_length=MAX_STATUS_IDS,
+        description="IDs of image, video, text or workflow tasks",
+    )
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "ids": ["9a34ab0a-9e9a-4b84-90f7-d8b30c59b6ae", "3f1c2d7e-5b6a-4c8d-9e0f-1a2b3c4d5e6f"],
+            }
+        }
+    )
+
+
+class TaskStatusItem(BaseModel):
+    id: UUID
+    status: TaskStatus
+    output: Union[List[HttpUrl], str, None] = Field(
+        default=None, description="Signed URLs for image, video and workflow tasks, the response for text tasks"
+    )
+    error_message: Optional[str] = None
+    logs: List[str] = Field(default=[], description="Queue position while waiting, otherwise the most recent logs")
+
+
+class TaskStatusResponse(BaseModel):
+    tasks: List[TaskStatusItem]
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "tasks": [
+                    {
+                        "id": "9a34ab0a-9e9a-4b84-90f7-d8b30c59b6ae",
+                        "status": "SUCCESS",
+                        "output": ["http://localhost:5000/api/files/..."],
+                        "error_message": None,
+                        "logs": ["Setup", "Progress: 10%", "Progress: 20%", "..."],
+                    },
+                    {
+                        "id": "3f1c2d7e-5b6a-4c8d-9e0f-1a2b3c4d5e6f",
+                        "status": "PENDING",
+                        "output": None,
+                        "error_message": None,
+                        "logs": ["Queue gpu position: 2 / 5"],
+                    },
+                ]
+            }
+        }
+    )
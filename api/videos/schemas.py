@@ -236,6 +236,7 @@ class VideoRequest(BaseModel):
 class VideoWorkerResponse(BaseModel):
     output: List[str]
     logs: List[str]
+    timings: Dict[str, float] = {}  # Seconds spent in each stage of the task, recorded by the worker
 
 
 class VideoResponse(BaseModel):
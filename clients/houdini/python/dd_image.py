@@ -1,5 +1,3 @@
-import time
-
 import hou
 from httpx import RemoteProtocolError
 
@@ -27,6 +25,7 @@ from utils import (
     reload_outputs,
     set_node_info,
     threaded,
+    wait_for_task_update,
 )
 
 
@@ -35,7 +34,7 @@ def _api_get_call(node, id, output_path: str, expanded_path: str, iterations=100
     set_node_info(node, TaskStatus.PENDING, "")
 
     for count in range(1, iterations + 1):
-        time.sleep(sleep_time)
+        wait_for_task_update(id, sleep_time)
 
         try:
             parsed = images_get.sync(id, client=client)
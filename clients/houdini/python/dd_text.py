@@ -1,5 +1,3 @@
-import time
-
 import hou
 from httpx import RemoteProtocolError
 
@@ -22,6 +20,7 @@ from utils import (
     polling_message,
     set_node_info,
     threaded,
+    wait_for_task_update,
 )
 
 
@@ -30,7 +29,7 @@ def _api_get_call(node, id, iterations=100, sleep_time=5, set_value="response"):
     set_node_info(node, TaskStatus.PENDING, "")
 
     for count in range(1, iterations + 1):
-        time.sleep(sleep_time)
+        wait_for_task_update(id, sleep_time)
 
         try:
             parsed = texts_get.sync(id, client=client)
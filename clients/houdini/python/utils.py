@@ -1,16 +1,21 @@
 import base64
+import hashlib
+import json
 import os
 import shutil
 import subprocess
 import tempfile
 import threading
+import time
 import traceback
 from contextlib import contextmanager
 from datetime import datetime
 from typing import Optional
 
 import hou
+import httpx
 
+from config import client
 from generated.api_client.models import References, TaskStatus
 
 COMPLETED_STATUS = [
@@ -21,6 +26,8 @@ COMPLETED_STATUS = [
     TaskStatus.IGNORED,
 ]
 
+BLOB_CHUNK_SIZE = 1024 * 1024
+
 
 # Decorators
 def threaded(fn):
@@ -58,6 +65,34 @@ def polling_message(count, iterations, sleep_time):
     return f"🔄 {count}/{iterations} • {current_time}s"
 
 
+def wait_for_task_update(task_id: str, timeout: float):
+    """
+    Waits up to timeout seconds between polls, returning as soon as the API streams that the task has finished.
+    Falls back to a plain sleep if the event stream is unavailable.
+    """
+    if timeout <= 0:
+        return
+
+    deadline = time.monotonic() + timeout
+    try:
+        with client.get_httpx_client().stream(
+            "GET", f"/api/tasks/{task_id}/events", timeout=httpx.Timeout(timeout)
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line.startswith("data:") and json.loads(line[5:]).get("status") in COMPLETED_STATUS:
+                    return
+                if time.monotonic() >= deadline:
+                    return
+        return  # The stream only closes once the task has finished
+    except httpx.TimeoutException:
+        return
+    except (httpx.HTTPError, ValueError) as e:
+        print(f"Task event stream unavailable, polling instead: {e}")
+
+    time.sleep(max(0.0, deadline - time.monotonic()))
+
+
 @contextmanager
 def houdini_error_handling(node):
     try:
@@ -130,6 +165,45 @@ def file_to_base64(file_path: str, debug=False) -> Optional[str]:
         raise ValueError(f"Error encoding file {file_path}: {str(e)}") from e
 
 
+def file_to_blob_ref(file_path: str) -> Optional[str]:
+    """
+    Upload a file to the API blob store and return a reference to send in place of base64 data.
+    Content the API already has is only checked with a HEAD request, so unchanged inputs are not re-sent.
+    Falls back to base64 if the API does not support blobs.
+    """
+    if not file_path:
+        return None
+
+    if not os.path.exists(file_path):
+        return None
+
+    if os.stat(file_path).st_size < 1000:  # 1000 bytes is still tiny for a real image
+        return None
+
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(BLOB_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    blob_id = digest.hexdigest()
+
+    http_client = client.get_httpx_client()
+    try:
+        response = http_client.head(f"/api/blobs/{blob_id}")
+        if response.status_code == 404:
+            with open(file_path, "rb") as f:
+                response = http_client.post(
+                    "/api/blobs",
+                    content=iter(lambda: f.read(BLOB_CHUNK_SIZE), b""),
+                    headers={"Content-Type": "application/octet-stream"},
+                )
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        print(f"Blob upload failed, sending {file_path} inline: {e}")
+        return file_to_base64(file_path)
+
+    return f"blob:{blob_id}"
+
+
 def base64_to_file(base64_str: str, output_path: str, save_copy: bool = False):
     """Convert a base64 string to a file  and save it to the specified path."""
 
@@ -207,8 +281,8 @@ def input_to_base64(node, input_name):
     rop.parm("copoutput").set(temp_path)
     rop.parm("execute").pressButton()
 
-    # Convert the saved file to base64
-    result = file_to_base64(temp_path)
+    # Upload the saved file, falls back to base64
+    result = file_to_blob_ref(temp_path)
 
     # Clean up
     rop.destroy()
@@ -297,8 +371,8 @@ def input_to_base64_video(node, input_name, num_frames=24):
     if not os.path.exists(temp_video_path):
         raise ValueError("FFmpeg encoding failed: output video file not found.")
 
-    # Convert the saved file to base64
-    result = file_to_base64(temp_video_path)
+    # Upload the saved file, falls back to base64
+    result = file_to_blob_ref(temp_video_path)
 
     # Clean up
     rop.destroy()
@@ -1,5 +1,3 @@
-import time
-
 import nuke
 from httpx import RemoteProtocolError
 
@@ -30,6 +28,7 @@ from utils import (
     set_node_value,
     threaded,
     update_read_range,
+    wait_for_task_update,
 )
 
 
@@ -43,7 +42,7 @@ def _api_get_call(node, id, output_path: str, current_frame: int, iterations=300
     set_node_info(node, TaskStatus.PENDING, "")
 
     for count in range(1, iterations + 1):
-        time.sleep(sleep_time)
+        wait_for_task_update(id, sleep_time)
 
         try:
             parsed = images_get.sync(id, client=client)
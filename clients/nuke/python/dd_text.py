@@ -1,5 +1,3 @@
-import time
-
 import nuke
 from httpx import RemoteProtocolError
 
@@ -24,6 +22,7 @@ from utils import (
     set_node_info,
     set_node_value,
     threaded,
+    wait_for_task_update,
 )
 
 
@@ -36,7 +35,7 @@ def create_dd_text_node():
 def _api_get_call(node, id, iterations=1, sleep_time=5, set_value="response"):
     set_node_info(node, TaskStatus.PENDING, "")
     for count in range(1, iterations + 1):
-        time.sleep(sleep_time)
+        wait_for_task_update(id, sleep_time)
 
         try:
             parsed = texts_get.sync(id, client=client)
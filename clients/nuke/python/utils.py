@@ -1,8 +1,11 @@
 import base64
+import hashlib
+import json
 import os
 import shutil
 import tempfile
 import threading
+import time
 import traceback
 from contextlib import contextmanager
 from datetime import datetime
@@ -11,12 +14,15 @@ from typing import Literal, Optional
 import httpx
 import nuke
 
+from config import client
 from generated.api_client.models import References, TaskStatus
 
 NODE_CONTROLNET = "dd_controlnet"
 NODE_ADAPTER = "dd_adapter"
 NODE_IMAGE = "dd_image"
 
+BLOB_CHUNK_SIZE = 1024 * 1024
+
 # Access mode constants
 MODE_GET = "get"
 MODE_VALUE = "value"
@@ -88,6 +94,34 @@ def polling_message(count, iterations, sleep_time, simple=True):
     return f"🔄 {count}/{iterations} • {current_time}s"
 
 
+def wait_for_task_update(task_id: str, timeout: float):
+    """
+    Waits up to timeout seconds between polls, returning as soon as the API streams that the task has finished.
+    Falls back to a plain sleep if the event stream is unavailable.
+    """
+    if timeout <= 0:
+        return
+
+    deadline = time.monotonic() + timeout
+    try:
+        with client.get_httpx_client().stream(
+            "GET", f"/api/tasks/{task_id}/events", timeout=httpx.Timeout(timeout)
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line.startswith("data:") and json.loads(line[5:]).get("status") in COMPLETED_STATUS:
+                    return
+                if time.monotonic() >= deadline:
+                    return
+        return  # The stream only closes once the task has finished
+    except httpx.TimeoutException:
+        return
+    except (httpx.HTTPError, ValueError) as e:
+        print(f"Task event stream unavailable, polling instead: {e}")
+
+    time.sleep(max(0.0, deadline - time.monotonic()))
+
+
 @contextmanager
 def nuke_error_handling(node):
     try:
@@ -215,6 +249,42 @@ def image_to_base64(image_path: str, debug=False) -> Optional[str]:
         raise ValueError(f"Error encoding image {image_path}: {str(e)}") from e
 
 
+def file_to_blob_ref(file_path: str) -> Optional[str]:
+    """
+    Upload a file to the API blob store and return a reference to send in place of base64 data.
+    Content the API already has is only checked with a HEAD request, so unchanged inputs are not re-sent.
+    Falls back to base64 if the API does not support blobs.
+    """
+    if not file_path:
+        return None
+
+    if not os.path.exists(file_path):
+        return None
+
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(BLOB_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    blob_id = digest.hexdigest()
+
+    http_client = client.get_httpx_client()
+    try:
+        response = http_client.head(f"/api/blobs/{blob_id}")
+        if response.status_code == 404:
+            with open(file_path, "rb") as f:
+                response = http_client.post(
+                    "/api/blobs",
+                    content=iter(lambda: f.read(BLOB_CHUNK_SIZE), b""),
+                    headers={"Content-Type": "application/octet-stream"},
+                )
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        print(f"Blob upload failed, sending {file_path} inline: {e}")
+        return image_to_base64(file_path)
+
+    return f"blob:{blob_id}"
+
+
 def snapshot_file(output_path: str):
     # save a timestamped version by copying the file to the sample path prepended with a /tmp/timestamp
     try:
@@ -231,18 +301,42 @@ def snapshot_file(output_path: str):
         raise ValueError(f"Error creating snapshot of file {output_path}: {str(e)}") from e
 
 
-def download_file(url: str, output_path: str):
-    """Download a file from a URL and save it to the specified path."""
+def download_file(url: str, output_path: str, attempts: int = 3):
+    """
+    Download a file from a URL and save it to the specified path.
+    An interrupted download resumes from where it stopped with a Range request, If-Range makes sure
+    the bytes already written belong to the same file.
+    """
+    part_path = f"{output_path}.part"
     try:
         dir_path = os.path.dirname(output_path)
         if dir_path and not os.path.exists(dir_path):
             os.makedirs(dir_path)
 
-        with httpx.stream("GET", url) as response:
-            response.raise_for_status()
-            with open(output_path, "wb") as f:
-                for chunk in response.iter_bytes():
-                    f.write(chunk)
+        etag = None
+        written = 0
+        for attempt in range(attempts):
+            headers = {}
+            if written and etag:
+                headers = {"Range": f"bytes={written}-", "If-Range": etag}
+
+            try:
+                with httpx.stream("GET", url, headers=headers) as response:
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        written = 0
+                    etag = response.headers.get("etag")
+
+                    with open(part_path, "ab" if written else "wb") as f:
+                        for chunk in response.iter_bytes():
+                            f.write(chunk)
+                            written += len(chunk)
+                break
+            except httpx.TransportError:
+                if attempt == attempts - 1:
+                    raise
+
+        os.replace(part_path, output_path)
     except Exception as e:
         raise ValueError(f"Error downloading file from {url}: {str(e)}") from e
 
@@ -250,7 +344,7 @@ def download_file(url: str, output_path: str):
 
 
 def node_to_base64(input_node, current_frame):
-    """Convert a Nuke node's output directly to base64 without saving to disk"""
+    """Convert a Nuke node's output to a request input, uploaded as a blob when the API supports it"""
     if not input_node:
         return None
 
@@ -271,7 +365,7 @@ def node_to_base64(input_node, current_frame):
         nuke.execute(temp_write.name(), current_frame, current_frame)
         nuke.tprint(f"Temporary image saved to: {temp_path}")
 
-        result = image_to_base64(temp_path)
+        result = file_to_blob_ref(temp_path)
     except Exception as e:
         nuke.tprint(f"Error converting node {input_node.name()} to base64: {str(e)}")
         result = None
@@ -282,7 +376,7 @@ def node_to_base64(input_node, current_frame):
 
 
 def node_to_base64_video(input_node, current_frame, num_frames=24):
-    """Convert a Nuke node's output directly to base64 H.264 video"""
+    """Convert a Nuke node's output to an H.264 video request input, uploaded as a blob when the API supports it"""
     if not input_node:
         return None
 
@@ -307,7 +401,7 @@ def node_to_base64_video(input_node, current_frame, num_frames=24):
         nuke.execute(temp_write.name(), start_frame, end_frame)
         nuke.tprint(f"Temporary video saved to: {temp_path}")
 
-        result = image_to_base64(temp_path)
+        result = file_to_blob_ref(temp_path)
     except Exception as e:
         nuke.tprint(f"Error converting node {input_node.name()} to base64 video: {str(e)}")
         result = None
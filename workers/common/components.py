@@ -0,0 +1,149 @@
+import gc
+from collections import OrderedDict
+from functools import wraps
+
+from accelerate.hooks import remove_hook_from_module
+from cachetools.keys import hashkey
+
+from common.config import settings
+from common.logger import logger, task_log
+from common.memory import free_gpu_memory
+
+
+class ComponentRegistry:
+    """
+    Refcounted registry of components shared between pipelines, such as text encoders and VAEs.
+
+    Every pipeline built with a shared component holds a reference to it. When the pipeline cache destroys a
+    pipeline it calls `release`, which detaches the shared components first so the pipeline cleanup never
+    moves or deletes weights another pipeline is still using. Components nobody uses are kept idle on the
+    CPU, up to `max_idle`, so the next pipeline that needs them skips the load.
+
+    A shared component carries the cpu offload hooks of one pipeline at a time, `claim` moves them over to
+    the pipeline about to run.
+    """
+
+    def __init__(self, max_idle=2):
+        self.components: dict = {}
+        self.refcounts: dict = {}
+        self.idle = OrderedDict()
+        self.max_idle = max_idle
+        self.hooked_by: dict = {}  # component key -> id of the pipeline whose offload hooks it carries
+        self._acquired = None  # keys handed out while a pipeline loader runs, see load_pipeline
+
+    def get_or_load(self, key, loader_fn):
+        if key in self.components:
+            self.idle.pop(key, None)
+            self.refcounts[key] += 1
+            logger.debug(f"Shared component hit for {key} - refs: {self.refcounts[key]}")
+            task_log(f"Reusing shared component {key[0]}")
+        else:
+            self.components[key] = loader_fn()
+            self.refcounts[key] = 1
+            logger.debug(f"Shared component loaded {key} - components: {len(self.components)}")
+
+        if self._acquired is not None:
+            self._acquired.append(key)
+        return self.components[key]
+
+    def load_pipeline(self, loader_fn):
+        """Run a pipeline loader, dropping the references it took if it raises so the components can be freed."""
+        self._acquired = []
+        try:
+            return loader_fn()
+        except BaseException:
+            for key in self._acquired:
+                self._release_key(key)
+            raise
+        finally:
+            self._acquired = None
+
+    def _find_key(self, component):
+        for key, shared in self.components.items():
+            if shared is component:
+                return key
+        return None
+
+    def is_shared(self, component) -> bool:
+        return self._find_key(component) is not None
+
+    def _shared_keys(self, pipeline) -> list:
+        keys = [self._find_key(component) for component in getattr(pipeline, "components", {}).values()]
+        return [key for key in keys if key is not None]
+
+    def claim(self, pipeline, hooked=False):
+        """
+        Make the shared components of `pipeline` run under its own offload hooks before it is used.
+        enable_model_cpu_offload rehooks every module of a pipeline, so a component shared with another
+        offloaded pipeline keeps the hooks of whichever was set up last. `hooked` records an offloaded
+        pipeline that was just set up without hooking it again.
+        """
+        keys = self._shared_keys(pipeline)
+        if all(self.hooked_by.get(key) == id(pipeline) for key in keys):
+            return
+
+        if not getattr(pipeline, "_cpu_offload_enabled", False):
+            # Resident pipelines expect their components on the GPU without any offload hooks
+            for key in keys:
+                remove_hook_from_module(self.components[key], recurse=True)
+                self.components[key].to("cuda")
+        elif not hooked:
+            logger.debug(f"Rehooking shared components {keys}")
+            pipeline.enable_model_cpu_offload()
+
+        for key in keys:
+            self.hooked_by[key] = id(pipeline)
+
+    def release(self, pipeline):
+        """Drop the references held by `pipeline` and detach them from it."""
+        for name, component in list(getattr(pipeline, "components", {}).items()):
+            key = self._find_key(component)
+            if key is None:
+                continue
+
+            setattr(pipeline, name, None)
+            if self.hooked_by.get(key) == id(pipeline):
+                self.hooked_by.pop(key)
+            self._release_key(key)
+
+    def _release_key(self, key):
+        self.refcounts[key] -= 1
+        if self.refcounts[key] > 0:
+            return
+
+        try:
+            self.components[key].to("cpu")
+        except Exception as e:
+            logger.warning(f"Error moving shared component {key} to CPU: {e}")
+
+        self.idle[key] = True
+        while len(self.idle) > self.max_idle:
+            oldest_key, _ = self.idle.popitem(last=False)
+            self._destroy(oldest_key)
+
+    def _destroy(self, key):
+        logger.debug(f"Destroying shared component {key}")
+        self.components.pop(key, None)
+        self.refcounts.pop(key, None)
+        self.hooked_by.pop(key, None)
+        gc.collect()
+        free_gpu_memory(message="Shared component cleaned up")
+
+    def clear(self):
+        """Destroy idle components, those still used by a pipeline are kept."""
+        for key in list(self.idle):
+            self._destroy(key)
+        self.idle.clear()
+
+
+# Global registry
+global_component_registry = ComponentRegistry(max_idle=settings.shared_component_max_idle)
+
+
+def decorator_shared_component(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        key = hashkey(func.__name__, *args, **kwargs)
+        return global_component_registry.get_or_load(key, lambda: func(*args, **kwargs))
+
+    return wrapper
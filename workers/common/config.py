@@ -1,6 +1,6 @@
 import logging
 import os
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -17,7 +17,26 @@ class Settings(BaseSettings):
     hf_home: str = ""
     comfy_api_url: Optional[str] = None
     ddiffusion_storage_directory: str = "/STORAGE"
+    # NOTE s3 only covers task outputs, uploaded input blobs still need the shared storage directory
+    storage_backend: Literal["local", "s3"] = "local"  # Where task outputs are kept, s3 also covers MinIO
+    s3_bucket: str = ""
+    s3_endpoint_url: Optional[str] = None  # Leave unset for AWS, e.g. http://minio:9000 for MinIO
+    s3_region: Optional[str] = None
     result_expires_days: int = 30  # Number of days to keep task results
+    pipeline_cache_max_models: int = 4  # Upper bound on resident pipelines, memory budgets normally apply first
+    pipeline_cache_gpu_fraction: float = 0.75  # Share of VRAM resident pipelines may use, the rest is for inference
+    pipeline_cache_cpu_budget_gib: float = 32.0  # Host RAM resident pipelines may use, covers offloaded weights
+    pipeline_cache_park_budget_gib: float = 0.0  # Host RAM to keep evicted pipelines warm for fast reloads, 0 disables
+    shared_component_max_idle: int = 2  # Shared text encoders and VAEs kept on the CPU once no pipeline uses them
+    prompt_cache_directory: str = ""  # Defaults to prompt_cache under hf_home, should be on a volume shared by workers
+    prompt_cache_disk_max_gib: float = 5.0  # Size bound of the disk prompt embedding cache, 0 disables it
+    result_cache_enabled: bool = False  # Return the outputs of an identical earlier request to a local model
+    gpu_batching: bool = False  # Pull waiting tasks for the resident model forward to avoid pipeline swaps
+    gpu_batching_max_wait_seconds: int = 300  # Stop reordering once the oldest waiting task has waited this long
+    task_log_max_lines: int = 500  # Running task logs are capped to the most recent lines
+    task_log_state_interval_seconds: float = 5.0  # Minimum time between task state writes while logging
+    task_progress_interval_seconds: float = 1.0  # Minimum time between inference step logs, the last is always logged
+    metrics_port: int = 9100  # Port of the Prometheus metrics of the worker, 0 disables
 
     @property
     def storage_dir(self) -> str:
@@ -1,9 +1,12 @@
 import logging
 import pprint
+import time
 import uuid
 
 from celery import current_task
 
+from common.config import settings
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
@@ -32,20 +35,61 @@ def task_log(message: str, log_to_logger: bool = True):
         # New task - reset logs
         task._meta = {"logs": []}
         task._logged_task_id = current_id
+        task._state_updated_at = None
 
     meta_existing = getattr(task, "_meta", {})
     logs = meta_existing.get("logs", [])
     logs.append(message)
+    # Same cap as the Redis list, so long running tasks do not grow the log kept for the result without bound
+    if len(logs) > settings.task_log_max_lines:
+        del logs[: -settings.task_log_max_lines]
 
     meta = {**meta_existing, "logs": logs}
     task._meta = meta
 
+    # Lines are appended to a capped list the API reads, the result backend only gets the tail now and then
+    _append_task_log(task.request, message)
+
+    now = time.monotonic()
+    updated_at = getattr(task, "_state_updated_at", None)
+    if updated_at is not None and now - updated_at < settings.task_log_state_interval_seconds:
+        return
+
+    task._state_updated_at = now
     try:
         task.update_state(state="STARTED", meta=meta)  # type: ignore
     except Exception as e:
         logger.error(f"Failed to update task state: {e}")
 
 
+def _append_task_log(request, message: str):
+    # NOTE lazy import to keep the logger free of the redis connection setup
+    from common.redis_manager import redis_manager
+
+    kwargs = getattr(request, "kwargs", None) or {}
+    try:
+        redis_manager.append_task_log(
+            request.id,
+            message,
+            key_id=kwargs.get("key_id"),
+            max_lines=settings.task_log_max_lines,
+            ttl_seconds=settings.result_expires_days * 24 * 3600,
+        )
+    except Exception as e:
+        logger.warning(f"Failed to append task log: {e}")
+
+
+def publish_task_event(request, event: dict):
+    """Push a task event to clients streaming the task, never fails the task itself."""
+    from common.redis_manager import redis_manager
+
+    kwargs = getattr(request, "kwargs", None) or {}
+    try:
+        redis_manager.publish_task_event(request.id, event, key_id=kwargs.get("key_id"))
+    except Exception as e:
+        logger.warning(f"Failed to publish task event: {e}")
+
+
 def get_task_logs() -> list[str]:
     """Get accumulated logs for the current task."""
     task = current_task
@@ -68,3 +112,11 @@ def get_task_id() -> str:
     if not task:
         return task_id
     return getattr(task.request, "id", task_id)
+
+
+def get_task_name() -> str:
+    """Get the current task name (e.g. "images.flux-1"). Empty string if not in a task context."""
+    task = current_task
+    if not task:
+        return ""
+    return getattr(task, "name", "") or ""
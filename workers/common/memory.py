@@ -1,5 +1,6 @@
 import gc
 
+import psutil
 import torch
 
 from common.logger import logger
@@ -27,6 +28,11 @@ def _get_gpu_memory_usage():
     return (total, used, reserved, allocated, usage_percent, allocated_percent)
 
 
+def _get_cpu_memory_usage() -> float:
+    """Resident memory of the current process in GiB."""
+    return psutil.Process().memory_info().rss / GB_BINARY
+
+
 def _get_gpu_memory_usage_pretty():
     total, used, reserved, allocated, usage_percent, allocated_percent = _get_gpu_memory_usage()
 
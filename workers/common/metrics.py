@@ -0,0 +1,142 @@
+import os
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Dict, List, Optional, Tuple
+
+from celery import current_task
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Histogram,
+    multiprocess,
+    start_http_server,
+)
+
+from common.config import settings
+from common.logger import logger
+
+# Stages run from milliseconds (cache hits) to minutes (pipeline loads, video denoising)
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+STAGE_SECONDS = Histogram(
+    "ddiffusion_worker_stage_seconds",
+    "Time spent in each stage of a task, one observation per stage and task",
+    ["task", "stage"],
+    buckets=STAGE_BUCKETS,
+)
+
+# Denoising runs are labelled by cpu offloading, to compare offloaded and resident runs of a model
+STEP_SECONDS = Histogram(
+    "ddiffusion_worker_denoise_step_seconds",
+    "Wall time of each denoising step",
+    ["task", "offloaded"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60),
+)
+
+PEAK_MEMORY_GIB = Histogram(
+    "ddiffusion_worker_denoise_peak_memory_gib",
+    "Peak memory of a denoising run, allocated CUDA memory or the process RSS without a GPU",
+    ["task", "offloaded"],
+    buckets=(1, 2, 4, 6, 8, 12, 16, 20, 24, 32, 40, 48, 64, 80, 96),
+)
+
+# Stage durations of running tasks, summed when a stage runs more than once (e.g. decoding image and mask)
+_task_timings: Dict[str, Dict[str, float]] = {}
+# CUDA event pairs of GPU spans, only resolved once the timings are read so the GPU is never waited on mid task
+_task_events: Dict[str, List[Tuple[str, Any, Any]]] = {}
+
+
+def _get_current_task_id() -> Optional[str]:
+    task = current_task
+    if not task:
+        return None
+    return getattr(task.request, "id", None)
+
+
+def record_span(stage: str, seconds: float, task_id: Optional[str] = None):
+    """Adds time to a stage of the current task, spans outside a task are not recorded."""
+    task_id = task_id or _get_current_task_id()
+    if not task_id:
+        return
+
+    timings = _task_timings.setdefault(task_id, {})
+    timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+def record_gpu_span(stage: str, start_event, end_event):
+    """Adds the time between two recorded torch.cuda.Event to a stage of the current task."""
+    task_id = _get_current_task_id()
+    if not task_id:
+        return
+
+    _task_events.setdefault(task_id, []).append((stage, start_event, end_event))
+
+
+def _resolve_gpu_spans(task_id: str):
+    events = _task_events.pop(task_id, [])
+    if not events:
+        return
+
+    events[-1][2].synchronize()  # Events complete in order, waiting for the last covers all of them
+    for stage, start_event, end_event in events:
+        record_span(stage, start_event.elapsed_time(end_event) / 1000, task_id=task_id)
+
+
+@contextmanager
+def span(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(stage, time.perf_counter() - start)
+
+
+def timed_span(stage: str):
+    """Decorator recording every call of the function as a span of the current task."""
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def get_task_timings() -> Dict[str, float]:
+    """Compact timing summary of the current task so far, seconds per stage."""
+    task_id = _get_current_task_id() or ""
+    _resolve_gpu_spans(task_id)
+    timings = _task_timings.get(task_id, {})
+    return {stage: round(seconds, 3) for stage, seconds in timings.items()}
+
+
+def finish_task_timings(task_id: str, task_name: str):
+    """Exports the stages of a finished task to the histograms."""
+    _resolve_gpu_spans(task_id)
+    timings = _task_timings.pop(task_id, {})
+    for stage, seconds in timings.items():
+        STAGE_SECONDS.labels(task=task_name, stage=stage).observe(seconds)
+
+
+def start_metrics_server():
+    """
+    Serves the Prometheus metrics of the worker. Prefork pools need PROMETHEUS_MULTIPROC_DIR set,
+    so the metrics recorded by the child processes are collected by the server in the main process.
+    """
+    if not settings.metrics_port:
+        return
+
+    registry = REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+
+    try:
+        start_http_server(settings.metrics_port, registry=registry)
+        logger.info(f"Serving Prometheus metrics on port {settings.metrics_port}")
+    except OSError as e:
+        logger.warning(f"Failed to start the metrics server on port {settings.metrics_port}: {e}")
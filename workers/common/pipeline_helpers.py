@@ -3,7 +3,7 @@ import os
 import time
 from collections import OrderedDict
 from functools import wraps
-from typing import Literal, Union
+from typing import Literal, Optional, Union
 
 import torch
 from accelerate.hooks import CpuOffload
@@ -12,9 +12,18 @@ from diffusers import GGUFQuantizationConfig
 from huggingface_hub import hf_hub_download
 from transformers import BitsAndBytesConfig, TorchAoConfig
 
+from common.components import global_component_registry
 from common.config import settings
-from common.logger import logger, task_log
-from common.memory import free_gpu_memory, gpu_memory_usage
+from common.logger import get_task_name, logger, task_log
+from common.memory import (
+    GB_BINARY,
+    _get_cpu_memory_usage,
+    _get_gpu_memory_usage,
+    free_gpu_memory,
+    get_gpu_memory,
+    gpu_memory_usage,
+)
+from common.metrics import PEAK_MEMORY_GIB, STEP_SECONDS, record_gpu_span, record_span, timed_span
 from common.prompt_caching import clear_global_prompt_cache, enable_prompt_caching
 from utils.utils import time_info_decorator
 
@@ -24,23 +33,81 @@ torch.backends.cuda.matmul.allow_tf32 = True  # Enable TF32 for faster matrix mu
 # Keep reference to original (if you want to restore later)
 _original_pre_forward = CpuOffload.pre_forward
 
+# Total time spent moving offloaded models onto the GPU, denoising steps report how much of it they caused
+_offload_seconds = 0.0
+
 
 @time_info_decorator
 def patched_pre_forward(self, module, *args, **kwargs):
-    """Patched pre_forward to log timiing for offloading."""
-    return _original_pre_forward(self, module, *args, **kwargs)
+    """Patched pre_forward to log and record timing for offloading."""
+    global _offload_seconds
+
+    start = time.perf_counter()
+    try:
+        return _original_pre_forward(self, module, *args, **kwargs)
+    finally:
+        elapsed = time.perf_counter() - start
+        _offload_seconds += elapsed
+        record_span("offload", elapsed)
 
 
 # Apply patch
 CpuOffload.pre_forward = patched_pre_forward
 
 
+def _is_nunchaku(pipeline) -> bool:
+    # NOTE Nunchaku transformers hold native buffers that do not survive a round trip to the CPU
+    transformer = getattr(pipeline, "transformer", None)
+    return type(transformer).__name__.startswith("Nunchaku")
+
+
+def _owned_modules(pipeline) -> list[torch.nn.Module]:
+    """Modules belonging only to this pipeline, shared components are left to the registry."""
+    if isinstance(pipeline, torch.nn.Module):
+        return [pipeline]
+
+    return [
+        component
+        for component in getattr(pipeline, "components", {}).values()
+        if isinstance(component, torch.nn.Module) and not global_component_registry.is_shared(component)
+    ]
+
+
+def _pin_memory(modules: list[torch.nn.Module]):
+    """Pin the host copy of every weight so promotion back to the GPU is a fast DMA copy."""
+    for module in modules:
+        for tensor in list(module.parameters()) + list(module.buffers()):
+            if tensor.device.type == "cpu" and not tensor.is_pinned():
+                tensor.data = tensor.data.pin_memory()
+
+
 class ModelLRUCache:
-    def __init__(self, max_models=1):
+    """
+    LRU cache of loaded pipelines bounded by GPU and CPU memory budgets rather than a fixed count.
+
+    The footprint of each pipeline is measured while it loads and remembered after it is evicted, so the
+    next load of the same key only evicts as much as it needs. A key that was never loaded is assumed to be
+    as large as the largest footprint seen so far, and if the load still runs out of GPU memory the least
+    recently used pipelines are evicted one at a time until it succeeds.
+
+    Evicted pipelines are parked in pinned host memory up to `park_budget_gib` and promoted back to the GPU
+    on the next request, which is a copy of the weights rather than a full reload.
+    """
+
+    def __init__(self, max_models=1, gpu_budget_fraction=1.0, cpu_budget_gib=float("inf"), park_budget_gib=0.0):
         self.cache = OrderedDict()
+        self.parked = OrderedDict()  # second tier, evicted pipelines kept in host memory
         self.max_models = max_models
+        self.gpu_budget_fraction = gpu_budget_fraction
+        self.cpu_budget_gib = cpu_budget_gib
+        self.park_budget_gib = park_budget_gib
+        self.owners: dict = {}  # cache key -> task name that loaded it, advertised for affinity routing
+        self.footprints: dict = {}  # cache key -> (gpu GiB, cpu GiB) measured at load, kept across evictions
+        self.offloaded: set = set()  # cache keys of pipelines with cpu offloading, their weights live in host memory
+        self._gpu_budget_gib = None
 
     def get_or_load(self, key, loader_fn):
+        requested = time.perf_counter()
         # Ensure we have enough free GPU memory before loading a new model
         free_gpu_memory(message="Before loading new model")
 
@@ -48,35 +115,160 @@ class ModelLRUCache:
             # Move to end (most recently used position)
             self.cache.move_to_end(key)
             logger.debug(f"Cache hit for {key}")
+            task_log("Pipeline cache hit")
+            global_component_registry.claim(self.cache[key])
+            record_span("pipeline_cache_hit", time.perf_counter() - requested)
             return self.cache[key]
 
-        # Evict least recently used model if at capacity
-        if len(self.cache) >= self.max_models:
+        # Evict least recently used models until the new one fits the budget
+        while self.cache and not self._fits(key):
             self._evict_lru()
 
-        task_log(f"Loading pipeline {key}")
+        if key in self.parked:
+            pipeline = self._promote(key)
+            if pipeline is not None:
+                record_span("pipeline_promote", time.perf_counter() - requested)
+                return pipeline
+
+        task_log(f"Pipeline cache miss, loading pipeline {key}")
         start = time.time()
-        pipeline = loader_fn()
+        while True:
+            gpu_before, cpu_before = _get_gpu_memory_usage()[3], _get_cpu_memory_usage()
+            try:
+                pipeline = global_component_registry.load_pipeline(loader_fn)
+                break
+            except torch.cuda.OutOfMemoryError:
+                # The estimate was too low, only now evict what the load actually needs
+                if not self.cache:
+                    raise
+                logger.warning(f"Out of GPU memory loading {key}, evicting the least recently used pipeline")
+                self._evict_lru()
+                free_gpu_memory(message="After out of memory")
+        gpu_after, cpu_after = _get_gpu_memory_usage()[3], _get_cpu_memory_usage()
+
+        # NOTE offloaded pipelines only hold GPU memory while they run, which the budget fraction leaves room for
+        if getattr(pipeline, "_cpu_offload_enabled", False):
+            self.offloaded.add(key)
+        else:
+            self.offloaded.discard(key)
+
+        global_component_registry.claim(pipeline, hooked=True)
         self.cache[key] = pipeline
+        self.owners[key] = get_task_name()
+        self.footprints[key] = (max(gpu_after - gpu_before, 0.0), max(cpu_after - cpu_before, 0.0))
         end = time.time()
         duration = end - start
-        logger.debug(f"Cache miss for {key} - took: {duration:.2f}s - Cache size: {len(self.cache)}/{self.max_models}")
+        logger.debug(
+            f"Cache miss for {key} - took: {duration:.2f}s - Cache size: {len(self.cache)}/{self.max_models} - "
+            f"GPU: {self._usage(0):.2f}/{self._gpu_budget():.2f}GiB, "
+            f"CPU: {self._usage(1):.2f}/{self.cpu_budget_gib:.2f}GiB"
+        )
         task_log(f"Pipeline loaded in {duration:.2f}s")
+        record_span("pipeline_load", time.perf_counter() - requested)
 
         return pipeline
 
+    def _gpu_budget(self) -> float:
+        # NOTE resolved lazily so importing the cache never touches CUDA
+        if self._gpu_budget_gib is None:
+            self._gpu_budget_gib = get_gpu_memory() * self.gpu_budget_fraction
+        return self._gpu_budget_gib
+
+    def _usage(self, index: int) -> float:
+        return sum(self.footprints[key][index] for key in self.cache)
+
+    def _fits(self, key) -> bool:
+        if len(self.cache) >= self.max_models:
+            return False
+
+        gpu, cpu = self._estimate(key)
+        return self._usage(0) + gpu <= self._gpu_budget() and self._usage(1) + cpu <= self.cpu_budget_gib
+
+    def _estimate(self, key) -> tuple[float, float]:
+        """Measured footprint of key, or the largest one seen so far if it was never loaded."""
+        if key in self.footprints:
+            return self.footprints[key]
+        if not self.footprints:
+            return 0.0, 0.0  # Nothing measured yet, only max_models applies
+
+        return max(gpu for gpu, _ in self.footprints.values()), max(cpu for _, cpu in self.footprints.values())
+
+    def _parked_size(self, key) -> float:
+        gpu, cpu = self.footprints[key]
+        # Offloaded pipelines already live in host memory, everything else brings its GPU weights along
+        return cpu if key in self.offloaded else cpu + gpu
+
     def _evict_lru(self):
         if not self.cache:
             return
 
         # Get the first item (least recently used)
-        oldest_key, oldest_pipeline = next(iter(self.cache.items()))
+        oldest_key, oldest_pipeline = self.cache.popitem(last=False)  # Remove from the beginning (LRU)
+
+        if self._park(oldest_key, oldest_pipeline):
+            return
 
         logger.debug(f"Evicting LRU model: {oldest_key}")
+        self.owners.pop(oldest_key, None)
         self._cleanup(oldest_pipeline)
-        self.cache.popitem(last=False)  # Remove from the beginning (LRU)
+
+    def _park(self, key, pipeline) -> bool:
+        """Move an evicted pipeline to pinned host memory, returns False if it should be destroyed instead."""
+        if self.park_budget_gib <= 0 or _is_nunchaku(pipeline):
+            return False
+
+        size = self._parked_size(key)
+        if size > self.park_budget_gib:
+            return False
+
+        while self.parked and sum(self._parked_size(k) for k in self.parked) + size > self.park_budget_gib:
+            parked_key, parked_pipeline = self.parked.popitem(last=False)
+            logger.debug(f"Evicting parked model: {parked_key}")
+            self.owners.pop(parked_key, None)
+            self._cleanup(parked_pipeline)
+
+        start = time.time()
+        try:
+            if not getattr(pipeline, "_cpu_offload_enabled", False):
+                # NOTE shared components stay where they are as other resident pipelines may be using them
+                modules = _owned_modules(pipeline)
+                for module in modules:
+                    module.to("cpu")
+                _pin_memory(modules)
+        except Exception as e:
+            logger.warning(f"Failed to park pipeline {key}, destroying instead: {e}")
+            return False
+
+        self.parked[key] = pipeline
+        free_gpu_memory(message="Pipeline parked")
+        logger.debug(f"Parked {key} in host memory - took: {time.time() - start:.2f}s - Parked: {len(self.parked)}")
+        return True
+
+    def _promote(self, key):
+        start = time.time()
+        pipeline = self.parked.pop(key)
+        try:
+            global_component_registry.claim(pipeline)
+            if not getattr(pipeline, "_cpu_offload_enabled", False):
+                pipeline.to("cuda")
+        except Exception as e:
+            logger.warning(f"Failed to promote pipeline {key}, reloading instead: {e}")
+            self._cleanup(pipeline)
+            return None
+
+        self.cache[key] = pipeline
+        duration = time.time() - start
+        logger.debug(f"Promoted {key} from host memory - took: {duration:.2f}s - Cache size: {len(self.cache)}")
+        task_log(f"Pipeline promoted from host memory in {duration:.2f}s")
+        return pipeline
 
     def _cleanup(self, pipeline):
+        # Detach shared text encoders and VAEs first so they survive the pipeline
+        try:
+            global_component_registry.release(pipeline)
+        except Exception as e:
+            logger.error(f"Error releasing shared components: {e}")
+
         # NOTE required for Nunchaku models to avoid memory leaks specifically with NunchakuFluxTransformer2dModel
         try:
             if hasattr(pipeline, "transformer"):
@@ -108,17 +300,29 @@ class ModelLRUCache:
 
     def clear(self):
         """Clean up all pipelines and clear the cache without triggering eviction logic."""
-        for _, pipeline in list(self.cache.items()):
+        for _, pipeline in list(self.cache.items()) + list(self.parked.items()):
             self._cleanup(pipeline)
         self.cache.clear()
+        self.parked.clear()
+        self.owners.clear()
+
+    def resident_task_names(self) -> set[str]:
+        """Task names whose pipelines are currently loaded, including those parked in host memory."""
+        return {name for name in self.owners.values() if name}
 
 
 # Global cache
-global_pipeline_cache = ModelLRUCache(max_models=1)
+global_pipeline_cache = ModelLRUCache(
+    max_models=settings.pipeline_cache_max_models,
+    gpu_budget_fraction=settings.pipeline_cache_gpu_fraction,
+    cpu_budget_gib=settings.pipeline_cache_cpu_budget_gib,
+    park_budget_gib=settings.pipeline_cache_park_budget_gib,
+)
 
 
 def clear_global_pipeline_cache():
     global_pipeline_cache.clear()
+    global_component_registry.clear()
     clear_global_prompt_cache()
 
 
@@ -138,6 +342,7 @@ def optimize_pipeline(pipe, offload=True, vae_tiling=True, apply_prompt_caching=
 
     if offload:
         pipe.enable_model_cpu_offload()
+        pipe._cpu_offload_enabled = True  # type: ignore[attr-defined]
     else:
         pipe.to("cuda")
 
@@ -159,6 +364,70 @@ def optimize_pipeline(pipe, offload=True, vae_tiling=True, apply_prompt_caching=
     if apply_prompt_caching:
         enable_prompt_caching(pipe)
 
+    instrument_pipeline(pipe)
+    return pipe
+
+
+def _record_forward_spans(module: torch.nn.Module, stage: str):
+    """
+    Records every forward call of the module as a span, including the offload hooks of accelerate.
+    Kernels run asynchronously, so on the GPU the span is a pair of CUDA events resolved when the task ends.
+    """
+    started: list = []
+
+    def pre_hook(module, args):
+        if torch.cuda.is_available():
+            event = torch.cuda.Event(enable_timing=True)
+            event.record()
+            started.append(event)
+        else:
+            started.append(time.perf_counter())
+
+    def post_hook(module, args, output):
+        if not started:
+            return
+
+        start = started.pop()
+        if isinstance(start, torch.cuda.Event):
+            end = torch.cuda.Event(enable_timing=True)
+            end.record()
+            record_gpu_span(stage, start, end)
+        else:
+            record_span(stage, time.perf_counter() - start)
+
+    module.register_forward_pre_hook(pre_hook)
+    module.register_forward_hook(post_hook)
+
+
+def instrument_pipeline(pipe):
+    """
+    Adds the encode_prompt, denoise and vae_decode spans and the denoising summary of task_log_callback.
+    Runs after prompt caching so cache hits are timed too. Shared components such as VAEs are only instrumented once.
+    """
+    if getattr(pipe, "_spans_enabled", False):
+        return pipe
+
+    if hasattr(pipe, "encode_prompt"):
+        pipe.encode_prompt = timed_span("encode_prompt")(pipe.encode_prompt)
+
+    for name in ["transformer", "transformer_2", "unet"]:
+        denoiser = getattr(pipe, name, None)
+        if isinstance(denoiser, torch.nn.Module) and not getattr(denoiser, "_spans_enabled", False):
+            _record_forward_spans(denoiser, "denoise")
+            denoiser._spans_enabled = True  # type: ignore[attr-defined]
+
+    # NOTE patched on the class as pipelines are called through type(pipe).__call__, once per pipeline class
+    pipeline_class = type(pipe)
+    if not pipeline_class.__dict__.get("_denoise_summary_enabled", False):
+        pipeline_class.__call__ = _summarise_denoise_metrics(pipeline_class.__call__)
+        pipeline_class._denoise_summary_enabled = True
+
+    vae = getattr(pipe, "vae", None)
+    if vae is not None and hasattr(vae, "decode") and not getattr(vae, "_spans_enabled", False):
+        vae.decode = timed_span("vae_decode")(vae.decode)
+        vae._spans_enabled = True
+
+    pipe._spans_enabled = True  # type: ignore[attr-defined]
     return pipe
 
 
@@ -265,12 +534,105 @@ def get_quantized_model(
     return model
 
 
+def _get_step_peak_memory() -> float:
+    """Peak memory since the previous step in GiB, allocated CUDA memory or the process RSS without a GPU."""
+    if not torch.cuda.is_available():
+        return _get_cpu_memory_usage()
+
+    peak = torch.cuda.max_memory_allocated() / GB_BINARY
+    torch.cuda.reset_peak_memory_stats()
+    return peak
+
+
+class DenoiseMetrics:
+    """
+    Step metrics of one denoising run: wall time and peak memory per step and the offload time the step caused.
+    A step is timed from the previous callback, so the first step also covers the setup before the denoising
+    loop (prompt encoding, latents) and is left out of the mean step time.
+    """
+
+    def __init__(self, num_inference_steps: int):
+        self.num_inference_steps = num_inference_steps
+        self.started = self.last_step = time.perf_counter()
+        self.offload_started = self.last_offload = _offload_seconds
+        self.last_logged: Optional[float] = None
+        self.step_seconds: list[float] = []
+        self.peak_memory_gib = 0.0
+        self.summarised = False
+        if torch.cuda.is_available():
+            torch.cuda.reset_peak_memory_stats()
+
+    def record_step(self, pipe, step: int):
+        now = time.perf_counter()
+        seconds, self.last_step = now - self.last_step, now
+        offload, self.last_offload = _offload_seconds - self.last_offload, _offload_seconds
+        memory = _get_step_peak_memory()
+        self.step_seconds.append(seconds)
+        self.peak_memory_gib = max(self.peak_memory_gib, memory)
+
+        offloaded = bool(getattr(pipe, "_cpu_offload_enabled", False))
+        STEP_SECONDS.labels(task=get_task_name(), offloaded=str(offloaded).lower()).observe(seconds)
+        logger.debug(f"Step {step + 1}: {seconds:.3f}s, peak memory {memory:.2f}GiB, offload {offload:.3f}s")
+
+        # Pipelines can run fewer steps than requested, e.g. image to image with a strength below 1
+        total = getattr(pipe, "_num_timesteps", None)
+        total = total if isinstance(total, int) and total > 0 else self.num_inference_steps
+        finished = step + 1 >= total
+
+        # Every log line is a Redis write, so progress is rate limited apart from the first and last step
+        if finished or self.last_logged is None or now - self.last_logged >= settings.task_progress_interval_seconds:
+            self.last_logged = now
+            rate = (step + 1) / max(now - self.started, 1e-9)
+            progress = f"Inference step {step + 1}/{total} ({(step + 1) / total * 100:.0f}%), {rate:.2f} it/s"
+            task_log(progress, log_to_logger=False)
+
+    def log_summary(self, pipe):
+        """Called once the pipeline call returns or raises, so runs that stop early are summarised too."""
+        if self.summarised or not self.step_seconds:
+            return
+
+        self.summarised = True
+        offloaded = bool(getattr(pipe, "_cpu_offload_enabled", False))
+        elapsed = self.last_step - self.started
+        steps = len(self.step_seconds)
+        later_steps = self.step_seconds[1:] or self.step_seconds
+        mean_step = sum(later_steps) / len(later_steps)
+        offload = self.last_offload - self.offload_started
+
+        PEAK_MEMORY_GIB.labels(task=get_task_name(), offloaded=str(offloaded).lower()).observe(self.peak_memory_gib)
+        task_log(
+            f"Denoised {get_task_name()} {steps} steps in {elapsed:.2f}s ({steps / max(elapsed, 1e-9):.2f} it/s), "
+            f"first step {self.step_seconds[0]:.2f}s, mean step {mean_step:.2f}s, "
+            f"peak memory {self.peak_memory_gib:.2f}GiB, offload {offload:.2f}s "
+            f"({'offloaded' if offloaded else 'resident'})"
+        )
+
+
 def task_log_callback(num_inference_steps: int):
-    """Factory function that creates a callback with num_inference_steps captured."""
+    """
+    Factory for the callback_on_step_end of a pipeline call, logs progress and records the step metrics.
+    Create it in the pipeline call, so the first step is timed from the start of the call.
+    """
+    metrics = DenoiseMetrics(num_inference_steps)
 
     def callback(pipe_instance, step: int, timestep: int, callback_kwargs: dict):
-        progress_pct = ((step + 1) / num_inference_steps) * 100
-        task_log(f"Inference step {step + 1}/{num_inference_steps} ({progress_pct:.0f}%)", log_to_logger=False)
+        metrics.record_step(pipe_instance, step)
         return callback_kwargs
 
+    callback.metrics = metrics  # type: ignore[attr-defined]
     return callback
+
+
+def _summarise_denoise_metrics(call):
+    """Wraps a pipeline class __call__ to log the summary of its task_log_callback however the call ends."""
+
+    @wraps(call)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return call(self, *args, **kwargs)
+        finally:
+            metrics = getattr(kwargs.get("callback_on_step_end"), "metrics", None)
+            if isinstance(metrics, DenoiseMetrics):
+                metrics.log_summary(self)
+
+    return wrapper
@@ -1,16 +1,27 @@
+import hashlib
+import inspect
+import json
+import os
+import uuid
 from collections import OrderedDict
 from functools import wraps
-from typing import Any
+from typing import Any, Optional
 
+import numpy as np
 import torch
 from diffusers import DiffusionPipeline
+from PIL import Image
+from safetensors import safe_open
+from safetensors.torch import save_file
 
+from common.config import settings
 from common.logger import logger
 
 # Global cache for prompt embeddings
-# Key is (pipeline_type, args, kwargs)
+# Key is (pipeline_type, fingerprint of the arguments)
 GLOBAL_PROMPT_CACHE: OrderedDict[Any, Any] = OrderedDict()
 MAX_PROMPT_CACHE_SIZE = 64
+PROMPT_CACHE_STATS = {"hits": 0, "disk_hits": 0, "misses": 0}
 
 
 def _move_to_device(obj: Any, device):
@@ -38,12 +49,11 @@ def get_prompt_cache_if_exists(cache_key):
     """
     if cache_key in GLOBAL_PROMPT_CACHE:
         GLOBAL_PROMPT_CACHE.move_to_end(cache_key)
-        logger.info(f"Using cached prompt embeddings for {cache_key[0]}")
         return GLOBAL_PROMPT_CACHE[cache_key]
     return None
 
 
-def add_prompt_cache(cache_key, result):
+def add_prompt_cache(cache_key, result, disk_key: Optional[str] = None):
     """
     Add a result to the global cache and manage its size.
     Automatically moves the result to CPU to save VRAM.
@@ -59,13 +69,179 @@ def add_prompt_cache(cache_key, result):
         f"Prompt cached for {cache_key[0]}. Current cache size: ({len(GLOBAL_PROMPT_CACHE)}/{MAX_PROMPT_CACHE_SIZE})"
     )
 
+    if disk_key is not None:
+        add_disk_prompt_cache(disk_key, cpu_result)
 
-def make_hashable(obj):
+
+# Disk tier, persists encode_prompt results as safetensors on the shared volume so every worker
+# can reuse them, and they survive restarts and clear_global_prompt_cache()
+
+
+def get_disk_prompt_cache_dir() -> str:
+    path = settings.prompt_cache_directory or os.path.join(settings.hf_home, "prompt_cache")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _flatten(obj, tensors: dict):
+    """Split a nested result into named tensors and a json structure, raises TypeError if it can not be stored."""
+    if isinstance(obj, torch.Tensor):
+        name = str(len(tensors))
+        tensors[name] = obj.contiguous()
+        return {"tensor": name}
     if isinstance(obj, (list, tuple)):
-        return tuple(make_hashable(i) for i in obj)
-    if isinstance(obj, dict):
-        return tuple(sorted((k, make_hashable(v)) for k, v in obj.items()))
-    return obj
+        return {"list" if isinstance(obj, list) else "tuple": [_flatten(i, tensors) for i in obj]}
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return {"value": obj}
+    raise TypeError(f"Unsupported type for disk prompt cache: {type(obj)}")
+
+
+def _unflatten(structure: dict, tensors: dict):
+    if "tensor" in structure:
+        return tensors[structure["tensor"]]
+    if "list" in structure:
+        return [_unflatten(i, tensors) for i in structure["list"]]
+    if "tuple" in structure:
+        return tuple(_unflatten(i, tensors) for i in structure["tuple"])
+    return structure["value"]
+
+
+def get_disk_prompt_cache_if_exists(disk_key: str):
+    path = os.path.join(get_disk_prompt_cache_dir(), f"{disk_key}.safetensors")
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with safe_open(path, framework="pt", device="cpu") as f:
+            structure = json.loads(f.metadata()["structure"])
+            tensors = {name: f.get_tensor(name) for name in f.keys()}
+        result = _unflatten(structure, tensors)
+        os.utime(path)  # Bump mtime, eviction is least recently used
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Removing unreadable prompt cache file {path}: {e}")
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+
+    return result
+
+
+def add_disk_prompt_cache(disk_key: str, cpu_result):
+    if settings.prompt_cache_disk_max_gib <= 0:
+        return
+
+    tensors: dict = {}
+    try:
+        structure = _flatten(cpu_result, tensors)
+    except TypeError as e:
+        logger.warning(f"Skipping disk prompt cache: {e}")
+        return
+
+    directory = get_disk_prompt_cache_dir()
+    path = os.path.join(directory, f"{disk_key}.safetensors")
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        save_file(tensors, tmp_path, metadata={"structure": json.dumps(structure)})
+        os.replace(tmp_path, path)  # Atomic so other workers never read a partial file
+    except Exception as e:
+        logger.warning(f"Failed to write prompt cache file {path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return
+
+    _trim_disk_prompt_cache(directory)
+
+
+def _trim_disk_prompt_cache(directory: str):
+    """Delete the least recently used files until the cache fits its size budget."""
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(".safetensors"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue  # Removed by another worker
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    budget = settings.prompt_cache_disk_max_gib * 1024**3
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= budget:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+# Arguments that do not change the embeddings, results are moved to the requested device on a hit
+_IGNORED_ARGUMENTS = {"device"}
+
+
+def _update_fingerprint(digest, obj):
+    """Feed a canonical form of obj into digest, content is hashed so equal tensors and images give equal keys."""
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        digest.update(f"{type(obj).__name__}:{obj!r};".encode())
+    elif isinstance(obj, torch.Tensor):
+        tensor = obj.detach().cpu().contiguous().reshape(-1)
+        digest.update(f"tensor:{obj.dtype}:{tuple(obj.shape)};".encode())
+        digest.update(tensor.view(torch.uint8).numpy().tobytes())
+    elif isinstance(obj, np.ndarray):
+        digest.update(f"ndarray:{obj.dtype}:{obj.shape};".encode())
+        digest.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, Image.Image):
+        digest.update(f"image:{obj.mode}:{obj.size};".encode())
+        digest.update(obj.tobytes())
+    elif isinstance(obj, torch.Generator):
+        digest.update(b"generator;")  # Text encoding is deterministic, the seed is irrelevant
+    elif isinstance(obj, (torch.device, torch.dtype)):
+        digest.update(f"{type(obj).__name__}:{obj};".encode())
+    elif isinstance(obj, (list, tuple)):
+        digest.update(f"{type(obj).__name__}[".encode())
+        for item in obj:
+            _update_fingerprint(digest, item)
+        digest.update(b"]")
+    elif isinstance(obj, dict):
+        digest.update(b"dict{")
+        for key in sorted(obj):
+            digest.update(f"{key!r}=".encode())
+            _update_fingerprint(digest, obj[key])
+        digest.update(b"}")
+    else:
+        raise TypeError(f"Unsupported type for prompt cache key: {type(obj)}")
+
+
+def fingerprint(signature: Optional[inspect.Signature], args, kwargs) -> str:
+    """
+    Stable digest of an encode_prompt call. Arguments are bound to the signature with defaults applied,
+    so passing a default explicitly or positionally gives the same key.
+    """
+    if signature is None:
+        arguments = {"args": args, **kwargs}
+    else:
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = {}
+        for name, value in bound.arguments.items():
+            if signature.parameters[name].kind is inspect.Parameter.VAR_KEYWORD:
+                arguments.update(value)
+            else:
+                arguments[name] = value
+
+    digest = hashlib.sha256()
+    _update_fingerprint(digest, {k: v for k, v in arguments.items() if k not in _IGNORED_ARGUMENTS})
+    return digest.hexdigest()
+
+
+def _record_prompt_cache(outcome: str, identity: str):
+    PROMPT_CACHE_STATS[outcome] += 1
+    stats = ", ".join(f"{name}: {count}" for name, count in PROMPT_CACHE_STATS.items())
+    logger.info(f"Prompt cache lookup for {identity}: {outcome} ({stats})")
 
 
 def enable_prompt_caching(pipeline: DiffusionPipeline) -> DiffusionPipeline:
@@ -84,23 +260,50 @@ def enable_prompt_caching(pipeline: DiffusionPipeline) -> DiffusionPipeline:
     original_encode_prompt = pipeline.encode_prompt
     pipeline_identity = pipeline.__class__.__name__
 
+    # Text encoder weights are part of the disk key as the same pipeline class can load different encoders
+    encoder_ids = sorted(
+        str(getattr(component, "name_or_path", type(component).__name__))
+        for name, component in getattr(pipeline, "components", {}).items()
+        if name.startswith("text_encoder") and component is not None
+    )
+    disk_identity = "|".join([pipeline_identity, *encoder_ids])
+
+    try:
+        signature: Optional[inspect.Signature] = inspect.signature(original_encode_prompt)
+    except (TypeError, ValueError):
+        signature = None
+
     @wraps(original_encode_prompt)
     def wrapped_encode_prompt(*args, **kwargs):
         try:
-            cache_key = (pipeline_identity, make_hashable(args), make_hashable(kwargs))
-        except (TypeError, ValueError):
-            logger.warning("Failed to create hashable cache key; skipping prompt caching")
+            digest = fingerprint(signature, args, kwargs)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Failed to create prompt cache key; skipping prompt caching: {e}")
             return original_encode_prompt(*args, **kwargs)
 
+        cache_key = (pipeline_identity, digest)
+        disk_key = None
+        if settings.prompt_cache_disk_max_gib > 0:
+            disk_key = hashlib.sha256(f"{disk_identity}|{digest}".encode()).hexdigest()
+
         cached_result = get_prompt_cache_if_exists(cache_key)
+        if cached_result is not None:
+            _record_prompt_cache("hits", pipeline_identity)
+        elif disk_key is not None:
+            cached_result = get_disk_prompt_cache_if_exists(disk_key)
+            if cached_result is not None:
+                _record_prompt_cache("disk_hits", pipeline_identity)
+                add_prompt_cache(cache_key, cached_result)
+
         if cached_result is not None:
             # Move back to the target device (e.g. CUDA)
             target_device = kwargs.get("device") or getattr(pipeline, "device", torch.device("cuda"))
             return _move_to_device(cached_result, target_device)
 
+        _record_prompt_cache("misses", pipeline_identity)
         result = original_encode_prompt(*args, **kwargs)
 
-        add_prompt_cache(cache_key, result)
+        add_prompt_cache(cache_key, result, disk_key=disk_key)
 
         return result
 
@@ -0,0 +1,151 @@
+import json
+import time
+from typing import Iterable, Optional
+
+import redis
+from redis import Redis
+
+from common.config import settings
+
+_redis_client = redis.from_url(settings.celery_broker_url, decode_responses=True)
+
+
+class RedisManager:
+    def __init__(self):
+        self.client: Redis = _redis_client
+        # NOTE key names must stay aligned with api/common/redis_manager.py
+        self.affinity_prefix = "DDIFFUSION_AFFINITY"
+        self.worker_queues_key = "DDIFFUSION_WORKER_QUEUES"
+        self.metrics_key = "DDIFFUSION_METRICS"
+        self.result_cache_prefix = "DDIFFUSION_RESULT_CACHE"
+        self.queue_index_prefix = "DDIFFUSION_QUEUE_INDEX"
+        self.task_events_prefix = "DDIFFUSION_TASK_EVENTS"
+        self.key_events_prefix = "DDIFFUSION_KEY_EVENTS"
+        self.task_logs_prefix = "DDIFFUSION_TASK_LOGS"
+        self.task_info_prefix = "DDIFFUSION_TASK_INFO"
+        # Register once at startup - see prioritise_task
+        self._batch_script = self.client.register_script(
+            """
+            local tasks = redis.call('LRANGE', KEYS[1], 0, -1)
+            local total = #tasks
+            if total < 2 then
+                return 0
+            end
+
+            -- The tail of the list is consumed next, nothing to do if it is already the same task
+            local oldest = tasks[total]
+            if string.find(oldest, ARGV[1], 1, true) then
+                return 0
+            end
+
+            -- Fairness bound: never jump ahead of a task that has waited too long
+            local enqueued_at = string.match(oldest, '"enqueued_at": ([%d%.]+)')
+            if enqueued_at and (tonumber(ARGV[2]) - tonumber(enqueued_at)) > tonumber(ARGV[3]) then
+                return 0
+            end
+
+            for i = total - 1, 1, -1 do
+                if string.find(tasks[i], ARGV[1], 1, true) then
+                    redis.call('LREM', KEYS[1], 1, tasks[i])
+                    redis.call('RPUSH', KEYS[1], tasks[i])
+
+                    -- Keep the queue index in step, the moved task now ranks first
+                    local task_id = string.match(tasks[i], '"id": "([%w%-]+)"')
+                    local head = redis.call('ZRANGE', KEYS[2], 0, 0, 'WITHSCORES')
+                    if task_id and head[2] and redis.call('ZSCORE', KEYS[2], task_id) then
+                        redis.call('ZADD', KEYS[2], tonumber(head[2]) - 1, task_id)
+                    end
+                    return 1
+                end
+            end
+            return 0
+        """
+        )
+
+    def _get_affinity_key(self, task_name: str) -> str:
+        return f"{self.affinity_prefix}:{task_name}"
+
+    def _get_queue_index_key(self, queue: str) -> str:
+        return f"{self.queue_index_prefix}:{queue}"
+
+    def advertise_resident_tasks(self, queue: str, resident: Iterable[str], evicted: Iterable[str] = ()):
+        """
+        Advertise which tasks have a warm pipeline on the worker consuming `queue`.
+        Each task name maps to a sorted set of worker queues scored by the last time they were seen,
+        so the API can ignore workers that stopped refreshing.
+        """
+        now = time.time()
+        pipe = self.client.pipeline()
+        pipe.zadd(self.worker_queues_key, {queue: now})
+        for task_name in resident:
+            pipe.zadd(self._get_affinity_key(task_name), {queue: now})
+        for task_name in evicted:
+            pipe.zrem(self._get_affinity_key(task_name), queue)
+        pipe.execute()
+
+    def prioritise_task(self, queue: str, task_name: str, max_wait_seconds: float) -> bool:
+        """
+        Moves the oldest waiting message for task_name to the front of the queue so the worker
+        keeps using the pipeline it already has loaded. Returns True if the queue was reordered.
+        """
+        marker = f'"task": "{task_name}"'
+        result = self._batch_script(
+            keys=[queue, self._get_queue_index_key(queue)], args=[marker, time.time(), max_wait_seconds]
+        )
+        return bool(result)
+
+    def unindex_task(self, queue: str, task_id: str):
+        """Remove a consumed task from the queue index the API uses for queue positions."""
+        self.client.zrem(self._get_queue_index_key(queue), task_id)
+
+    def _publish_task_event(self, pipe, task_id: str, event: dict, key_id: Optional[str]):
+        message = json.dumps(event)
+        pipe.publish(f"{self.task_events_prefix}:{task_id}", message)
+        if key_id:
+            pipe.publish(f"{self.key_events_prefix}:{key_id}", message)
+
+    def publish_task_event(self, task_id: str, event: dict, key_id: Optional[str] = None):
+        """Publish a task event for the API streaming endpoints, per task and per API key."""
+        pipe = self.client.pipeline()
+        self._publish_task_event(pipe, task_id, event, key_id)
+        pipe.execute()
+
+    def append_task_log(self, task_id: str, message: str, key_id: Optional[str], max_lines: int, ttl_seconds: int):
+        """
+        Append a line to the capped log list of a running task and publish it as a log event,
+        in a single round trip. Each write only carries the new line.
+        """
+        key = f"{self.task_logs_prefix}:{task_id}"
+        pipe = self.client.pipeline()
+        pipe.rpush(key, message)
+        pipe.ltrim(key, -max_lines, -1)
+        pipe.expire(key, ttl_seconds)
+        self._publish_task_event(pipe, task_id, {"type": "log", "id": task_id, "message": message}, key_id)
+        pipe.execute()
+
+    def update_task_info(self, task_id: str, fields: dict, ttl_seconds: int):
+        """Record task metadata (timings, worker, state) the API returns with the task, replacing Flower lookups."""
+        key = f"{self.task_info_prefix}:{task_id}"
+        pipe = self.client.pipeline()
+        pipe.hset(key, mapping=fields)
+        pipe.expire(key, ttl_seconds)
+        pipe.execute()
+
+    def increment_metric(self, name: str, amount: int = 1) -> int:
+        return int(self.client.hincrby(self.metrics_key, name, amount))  # type: ignore
+
+    def get_cached_result(self, key: str) -> Optional[str]:
+        return self.client.get(f"{self.result_cache_prefix}:{key}")  # type: ignore
+
+    def set_cached_result(self, key: str, value: str, ttl_seconds: int):
+        self.client.set(f"{self.result_cache_prefix}:{key}", value, ex=ttl_seconds)
+
+    def withdraw_worker_queue(self, queue: str, task_names: Iterable[str]):
+        """Remove the worker queue from all affinity sets, used on worker shutdown."""
+        pipe = self.client.pipeline()
+        for task_name in task_names:
+            pipe.zrem(self._get_affinity_key(task_name), queue)
+        pipe.execute()
+
+
+redis_manager = RedisManager()
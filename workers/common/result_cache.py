@@ -0,0 +1,77 @@
+import hashlib
+import json
+from functools import wraps
+from pathlib import Path
+from typing import Optional
+
+from common.config import settings
+from common.logger import get_task_logs, get_task_name, logger, task_log
+from common.metrics import get_task_timings
+from common.redis_manager import redis_manager
+from common.storage import storage_backend
+
+_code_version: Optional[str] = None
+
+
+def get_code_version() -> str:
+    """Digest of the worker sources, a code change invalidates every cached result."""
+    global _code_version
+
+    if _code_version is None:
+        root = Path(__file__).resolve().parent.parent
+        digest = hashlib.sha256()
+        for path in sorted(root.rglob("*.py")):
+            if "tests" in path.relative_to(root).parts:
+                continue
+            digest.update(str(path.relative_to(root)).encode())
+            digest.update(path.read_bytes())
+        _code_version = digest.hexdigest()
+
+    return _code_version
+
+
+def make_result_key(task_name: str, args: dict) -> str:
+    payload = json.dumps(args, sort_keys=True, default=str)
+    return hashlib.sha256(f"{task_name}|{get_code_version()}|{payload}".encode()).hexdigest()
+
+
+def _outputs_exist(result: dict) -> bool:
+    outputs = result.get("output") or []
+    return bool(outputs) and all(storage_backend.exists(path) for path in outputs)
+
+
+def decorator_result_cache(func):
+    """
+    Opt-in cache for seeded local models, an identical request for the same model and worker code returns
+    the files of the earlier run instead of spending GPU time regenerating them.
+    """
+
+    @wraps(func)
+    def wrapper(args, **kwargs):
+        if not settings.result_cache_enabled:
+            return func(args, **kwargs)
+
+        try:
+            key = make_result_key(get_task_name(), args)
+            cached = redis_manager.get_cached_result(key)
+        except Exception as e:
+            logger.warning(f"Result cache lookup failed: {e}")
+            return func(args, **kwargs)
+
+        if cached is not None:
+            result = json.loads(cached)
+            if _outputs_exist(result):
+                task_log("Result cache hit, returning outputs of an identical earlier request")
+                return {**result, "logs": get_task_logs(), "timings": get_task_timings()}
+            logger.info("Result cache entry is stale, outputs no longer exist")
+
+        result = func(args, **kwargs)
+
+        try:
+            redis_manager.set_cached_result(key, json.dumps(result), settings.result_expires_days * 24 * 60 * 60)
+        except Exception as e:
+            logger.warning(f"Failed to store result in cache: {e}")
+
+        return result
+
+    return wrapper
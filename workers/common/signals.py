@@ -0,0 +1,201 @@
+import time
+from typing import Optional
+
+from celery.signals import (
+    celeryd_after_setup,
+    heartbeat_sent,
+    task_failure,
+    task_postrun,
+    task_prerun,
+    task_received,
+    task_retry,
+    task_revoked,
+    worker_init,
+    worker_shutdown,
+)
+
+from common.config import settings
+from common.logger import logger, publish_task_event
+from common.metrics import finish_task_timings, record_span, start_metrics_server
+from common.redis_manager import redis_manager
+
+ADVERTISE_INTERVAL_SECONDS = 10
+TASK_INFO_TTL_SECONDS = settings.result_expires_days * 24 * 3600
+
+# Private queue consumed by this worker alongside the shared gpu queue, None for cpu only workers
+worker_queue: Optional[str] = None
+_advertised: set[str] = set()
+_last_advertised = 0.0
+# Start times of running tasks, used for the runtime recorded with the task info
+_started_at: dict[str, float] = {}
+
+
+@worker_init.connect
+def on_worker_init(sender=None, **kwargs):
+    start_metrics_server()
+
+
+@celeryd_after_setup.connect
+def setup_worker_queue(sender, instance, **kwargs):
+    """GPU workers also consume a private queue so the API can route tasks to a worker with a warm pipeline."""
+    global worker_queue
+
+    consume_from = instance.app.amqp.queues.consume_from or {}
+    if "gpu" not in consume_from:
+        return
+
+    worker_queue = f"gpu.{sender}"
+    instance.app.amqp.queues.select_add(worker_queue)
+    logger.info(f"Worker consuming private affinity queue {worker_queue}")
+
+
+def advertise_resident_tasks(force: bool = False):
+    global _advertised, _last_advertised
+
+    if worker_queue is None:
+        return
+
+    now = time.time()
+    if not force and now - _last_advertised < ADVERTISE_INTERVAL_SECONDS:
+        return
+
+    # NOTE lazy import so cpu workers never pull in the diffusers stack
+    from common.pipeline_helpers import global_pipeline_cache
+
+    resident = global_pipeline_cache.resident_task_names()
+    try:
+        redis_manager.advertise_resident_tasks(worker_queue, resident, evicted=_advertised - resident)
+    except Exception as e:
+        logger.warning(f"Failed to advertise resident pipelines: {e}")
+        return
+
+    _advertised = resident
+    _last_advertised = now
+
+
+def batch_resident_tasks(task_name: str):
+    """
+    Optional scheduling mode for gpu workers, drains waiting tasks for the model that is already loaded
+    before switching to another one. Runs before the finished task is acknowledged so the reordered
+    message is the next one fetched.
+    """
+    if not settings.gpu_batching or worker_queue is None:
+        return
+
+    from common.pipeline_helpers import global_pipeline_cache
+
+    if task_name not in global_pipeline_cache.resident_task_names():
+        return
+
+    for queue in ["gpu", worker_queue]:
+        try:
+            if redis_manager.prioritise_task(queue, task_name, settings.gpu_batching_max_wait_seconds):
+                swaps_avoided = redis_manager.increment_metric("gpu_swaps_avoided")
+                logger.info(f"Batched next {task_name} task from {queue}, swaps avoided: {swaps_avoided}")
+                return
+        except Exception as e:
+            logger.warning(f"Failed to batch waiting tasks on {queue}: {e}")
+
+
+def update_task_info(task_id: Optional[str], **fields):
+    if not task_id:
+        return
+
+    fields = {key: value for key, value in fields.items() if value is not None}
+    try:
+        redis_manager.update_task_info(task_id, fields, TASK_INFO_TTL_SECONDS)
+    except Exception as e:
+        logger.warning(f"Failed to update task info for {task_id}: {e}")
+
+
+@task_received.connect
+def on_task_received(sender=None, request=None, **kwargs):
+    if request is None:
+        return
+
+    queue = (request.delivery_info or {}).get("routing_key")
+    update_task_info(
+        request.id, name=request.name, state="RECEIVED", received=time.time(), worker=request.hostname, queue=queue
+    )
+
+    # The message has left the broker list, so it no longer counts towards queue positions
+    if not queue:
+        return
+
+    try:
+        redis_manager.unindex_task(queue, request.id)
+    except Exception as e:
+        logger.warning(f"Failed to remove task {request.id} from the {queue} index: {e}")
+
+
+@task_prerun.connect
+def on_task_prerun(sender=None, task_id=None, **kwargs):
+    if sender is None:
+        return
+
+    _started_at[task_id] = time.time()
+    # The API stamps every message when it is sent
+    enqueued_at = sender.request.get("enqueued_at")
+    if enqueued_at:
+        record_span("queue_wait", max(_started_at[task_id] - float(enqueued_at), 0.0), task_id=task_id)
+
+    update_task_info(task_id, state="STARTED", started=_started_at[task_id], worker=sender.request.hostname)
+    publish_task_event(sender.request, {"type": "status", "id": task_id, "status": "STARTED"})
+
+
+@task_postrun.connect
+def on_task_postrun(sender=None, task_id=None, state=None, **kwargs):
+    finished = time.time()
+    started = _started_at.pop(task_id, None)
+    update_task_info(
+        task_id,
+        state=state,
+        succeeded=finished if state == "SUCCESS" else None,
+        failed=finished if state == "FAILURE" else None,
+        runtime=round(finished - started, 3) if started else None,
+    )
+
+    # The result is already stored, so clients streaming the task can read it straight away
+    if sender is not None and state:
+        publish_task_event(sender.request, {"type": "status", "id": task_id, "status": state})
+
+    if started:
+        record_span("run", finished - started, task_id=task_id)
+    finish_task_timings(task_id, getattr(sender, "name", ""))
+    advertise_resident_tasks(force=True)
+    batch_resident_tasks(getattr(sender, "name", ""))
+
+
+@task_retry.connect
+def on_task_retry(sender=None, request=None, reason=None, **kwargs):
+    if request is not None:
+        update_task_info(request.id, state="RETRY", retries=request.retries + 1, exception=str(reason))
+
+
+@task_failure.connect
+def on_task_failure(sender=None, task_id=None, exception=None, **kwargs):
+    update_task_info(task_id, exception=str(exception))
+
+
+@task_revoked.connect
+def on_task_revoked(sender=None, request=None, **kwargs):
+    if request is not None:
+        update_task_info(request.id, state="REVOKED", revoked=time.time())
+        publish_task_event(request, {"type": "status", "id": request.id, "status": "REVOKED"})
+
+
+@heartbeat_sent.connect
+def on_heartbeat_sent(sender=None, **kwargs):
+    # Keeps an idle worker fresh so the API keeps routing to it
+    advertise_resident_tasks()
+
+
+@worker_shutdown.connect
+def on_worker_shutdown(sender=None, **kwargs):
+    if worker_queue is None:
+        return
+
+    try:
+        redis_manager.withdraw_worker_queue(worker_queue, _advertised)
+    except Exception as e:
+        logger.warning(f"Failed to withdraw worker queue {worker_queue}: {e}")
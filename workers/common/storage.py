@@ -0,0 +1,34 @@
+from pathlib import Path
+from typing import List
+
+from common.config import settings
+from common.metrics import timed_span
+from common.storage_backends import LocalStorage, S3Storage, StorageBackend
+
+
+def _create_storage_backend() -> StorageBackend:
+    if settings.storage_backend == "s3":
+        return S3Storage(settings.s3_bucket, endpoint_url=settings.s3_endpoint_url, region=settings.s3_region)
+
+    return LocalStorage(settings.storage_dir)
+
+
+storage_backend = _create_storage_backend()
+
+
+@timed_span("upload")
+def store_outputs(paths: List[Path]) -> List[str]:
+    """
+    Puts files written under the storage directory into the storage backend and returns their keys,
+    which are the task output. With a remote backend the local file was only scratch space and is removed.
+    """
+    storage_dir = Path(settings.storage_dir)
+    keys = []
+    for path in paths:
+        key = path.relative_to(storage_dir).as_posix()
+        storage_backend.put(key, str(path))
+        if not storage_backend.local:
+            path.unlink(missing_ok=True)
+        keys.append(key)
+
+    return keys
@@ -0,0 +1,140 @@
+# NOTE edit the api copy, it is copied to the workers by make copy-schemas
+import mimetypes
+import shutil
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable, Optional
+
+
+class StorageBackend(ABC):
+    """
+    Where task outputs are kept. Files are addressed by keys relative to the storage root,
+    such as images/sd-xl/<task_id>-0.png, which is also what workers return as task output.
+    """
+
+    local = False
+
+    @abstractmethod
+    def put(self, key: str, path: str):
+        """Store the local file at path under key."""
+        pass
+
+    @abstractmethod
+    def get(self, key: str, path: str):
+        """Copy the stored file to the local path."""
+        pass
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        pass
+
+    @abstractmethod
+    def presign(self, key: str, expires_in: int) -> str:
+        """Time limited URL clients download the file from."""
+        pass
+
+    @abstractmethod
+    def delete(self, key: str):
+        pass
+
+
+class LocalStorage(StorageBackend):
+    """
+    Storage directory shared by the API and workers. Downloads go through the API files router,
+    so presign needs the signer of the API.
+    """
+
+    local = True
+
+    def __init__(self, root: str, signer: Optional[Callable[[str, int], str]] = None):
+        self.root = Path(root)
+        self.signer = signer
+
+    def _get_path(self, key: str) -> Path:
+        return self.root / key
+
+    def put(self, key: str, path: str):
+        target = self._get_path(key)
+        if target.resolve() == Path(path).resolve():
+            return  # Already written in place
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(path, target)
+
+    def get(self, key: str, path: str):
+        source = self._get_path(key)
+        if source.resolve() != Path(path).resolve():
+            shutil.copyfile(source, path)
+
+    def exists(self, key: str) -> bool:
+        return self._get_path(key).is_file()
+
+    def presign(self, key: str, expires_in: int) -> str:
+        if self.signer is None:
+            raise RuntimeError("Local storage has no signer, URLs for local files are signed by the API")
+        if not self.exists(key):
+            raise FileNotFoundError(f"File not found for signed URL generation: {self._get_path(key)}")
+
+        return self.signer(key, expires_in)
+
+    def delete(self, key: str):
+        self._get_path(key).unlink(missing_ok=True)
+
+
+class S3Storage(StorageBackend):
+    """
+    S3 compatible object storage such as AWS S3 or MinIO. Credentials are read by boto3 from the
+    standard AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY environment variables.
+    Presigned URLs point straight at the bucket, so file downloads never pass through the API.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        public_endpoint_url: Optional[str] = None,
+    ):
+        # NOTE lazy import so boto3 is only needed when the s3 backend is used
+        import boto3
+        from botocore.config import Config
+
+        if not bucket:
+            raise ValueError("An S3 bucket is required for the s3 storage backend")
+
+        config = Config(signature_version="s3v4")
+        self.bucket = bucket
+        self.client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region, config=config)
+        # Presigning is offline, a separate client lets internal traffic and clients use different hosts
+        self.presign_client = self.client
+        if public_endpoint_url and public_endpoint_url != endpoint_url:
+            self.presign_client = boto3.client(
+                "s3", endpoint_url=public_endpoint_url, region_name=region, config=config
+            )
+
+    def put(self, key: str, path: str):
+        content_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+        self.client.upload_file(path, self.bucket, key, ExtraArgs={"ContentType": content_type})
+
+    def get(self, key: str, path: str):
+        self.client.download_file(self.bucket, key, path)
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def presign(self, key: str, expires_in: int) -> str:
+        # No existence check, that would cost a round trip per file. A missing object is a 404 from the bucket.
+        return self.presign_client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket, "Key": key}, ExpiresIn=expires_in
+        )
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
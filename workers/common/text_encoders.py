@@ -2,6 +2,7 @@ from typing import Literal
 
 import torch
 from transformers import (
+    CLIPTextModel,
     Mistral3ForConditionalGeneration,
     Qwen2_5_VLForConditionalGeneration,
     Qwen3ForCausalLM,
@@ -9,9 +10,22 @@ from transformers import (
     UMT5EncoderModel,
 )
 
+from common.components import decorator_shared_component
 from common.pipeline_helpers import get_quantized_model
 
+# NOTE encoders are shared between every pipeline that uses them, see common/components.py
 
+
+@decorator_shared_component
+def get_clip_text_encoder() -> CLIPTextModel:
+    return CLIPTextModel.from_pretrained(
+        "black-forest-labs/FLUX.1-schnell",
+        subfolder="text_encoder",
+        torch_dtype=torch.bfloat16,
+    )
+
+
+@decorator_shared_component
 def get_t5_text_encoder() -> T5EncoderModel:
     return get_quantized_model(
         model_id="black-forest-labs/FLUX.1-schnell",
@@ -22,6 +36,7 @@ def get_t5_text_encoder() -> T5EncoderModel:
     )
 
 
+@decorator_shared_component
 def get_qwen2_5_text_encoder(
     target_precision: Literal[4, 8, 16] = 4,
 ) -> Qwen2_5_VLForConditionalGeneration:
@@ -34,6 +49,7 @@ def get_qwen2_5_text_encoder(
     )
 
 
+@decorator_shared_component
 def get_umt5_text_encoder() -> UMT5EncoderModel:
     return get_quantized_model(
         model_id="Wan-AI/Wan2.1-I2V-14B-480P-Diffusers",
@@ -44,6 +60,7 @@ def get_umt5_text_encoder() -> UMT5EncoderModel:
     )
 
 
+@decorator_shared_component
 def get_mistral3_text_encoder() -> Mistral3ForConditionalGeneration:
     return get_quantized_model(
         # NOTE just used the one allready in 4bit for now
@@ -57,6 +74,7 @@ def get_mistral3_text_encoder() -> Mistral3ForConditionalGeneration:
     )
 
 
+@decorator_shared_component
 def get_qwen3_4b_text_encoder() -> Qwen3ForCausalLM:
     return get_quantized_model(
         model_id="Qwen/Qwen3-4B",
@@ -67,6 +85,7 @@ def get_qwen3_4b_text_encoder() -> Qwen3ForCausalLM:
     )
 
 
+@decorator_shared_component
 def get_qwen3_8b_text_encoder() -> Qwen3ForCausalLM:
     return get_quantized_model(
         model_id="Qwen/Qwen3-8B",
@@ -0,0 +1,26 @@
+import torch
+from diffusers import AutoencoderKL, AutoencoderKLWan
+
+from common.components import decorator_shared_component
+
+# NOTE only models whose checkpoints ship identical VAE weights share a getter here
+
+
+@decorator_shared_component
+def get_flux_1_vae() -> AutoencoderKL:
+    # Same autoencoder for FLUX.1 dev, Krea, Kontext and Fill
+    return AutoencoderKL.from_pretrained(
+        "black-forest-labs/FLUX.1-schnell",
+        subfolder="vae",
+        torch_dtype=torch.bfloat16,
+    )
+
+
+@decorator_shared_component
+def get_wan_vae() -> AutoencoderKLWan:
+    # Wan 2.1 autoencoder, also used unchanged by the Wan 2.2 A14B and VACE checkpoints
+    return AutoencoderKLWan.from_pretrained(
+        "Wan-AI/Wan2.2-T2V-A14B-Diffusers",
+        subfolder="vae",
+        torch_dtype=torch.float32,
+    )
@@ -1,8 +1,10 @@
 import pytest
+import torch
 
 from common.memory import free_gpu_memory
 
 
 def pytest_sessionfinish(session, exitstatus):
     """Called after all tests have finished."""
-    free_gpu_memory()
+    if torch.cuda.is_available():
+        free_gpu_memory()
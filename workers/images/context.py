@@ -7,6 +7,7 @@ from PIL import Image
 
 from common.config import settings
 from common.logger import get_task_id, logger, task_log
+from common.metrics import timed_span
 from images.schemas import ImageRequest
 from utils.utils import ensure_divisible, image_crop, image_resize, load_image_if_exists
 
@@ -68,6 +69,7 @@ class ImageContext:
         abs_path.parent.mkdir(parents=True, exist_ok=True)
         return abs_path
 
+    @timed_span("save")
     def save_output(self, image: Image.Image, index: int = 0) -> Path:
         abs_path = self.get_output_path(index)
         try:
@@ -18,7 +18,8 @@ from common.pipeline_helpers import (
     optimize_pipeline,
     task_log_callback,
 )
-from common.text_encoders import get_t5_text_encoder
+from common.text_encoders import get_clip_text_encoder, get_t5_text_encoder
+from common.vaes import get_flux_1_vae
 from images.context import ImageContext
 
 
@@ -30,7 +31,9 @@ def get_pipeline(model_id):
 
     pipe = FluxPipeline.from_pretrained(
         model_id,
+        text_encoder=get_clip_text_encoder(),
         text_encoder_2=get_t5_text_encoder(),
+        vae=get_flux_1_vae(),
         transformer=transformer,
         torch_dtype=torch.bfloat16,
     )
@@ -46,7 +49,9 @@ def get_kontext_pipeline(model_id):
 
     pipe = FluxKontextPipeline.from_pretrained(
         model_id,
+        text_encoder=get_clip_text_encoder(),
         text_encoder_2=get_t5_text_encoder(),
+        vae=get_flux_1_vae(),
         transformer=transformer,
         torch_dtype=torch.bfloat16,
     )
@@ -62,7 +67,9 @@ def get_inpainting_pipeline(model_id):
 
     pipe = FluxFillPipeline.from_pretrained(
         model_id,
+        text_encoder=get_clip_text_encoder(),
         text_encoder_2=get_t5_text_encoder(),
+        vae=get_flux_1_vae(),
         transformer=transformer,
         torch_dtype=torch.bfloat16,
     )
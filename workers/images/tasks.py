@@ -1,17 +1,18 @@
 from pathlib import Path
 from typing import List
 
-from common.config import settings
 from common.logger import get_task_logs
+from common.metrics import get_task_timings
+from common.result_cache import decorator_result_cache
+from common.storage import store_outputs
 from images.context import ImageContext
 from images.schemas import ImageRequest, ImageWorkerResponse, ModelName
 from worker import celery_app
 
 
 def process_result(context: ImageContext, result: List[Path]):
-    storage_dir = Path(settings.storage_dir)
-    output = [str(path.relative_to(storage_dir)) for path in result]
-    return ImageWorkerResponse(output=output, logs=get_task_logs()).model_dump()
+    output = store_outputs(result)  # Stored first so the upload is part of the timings
+    return ImageWorkerResponse(output=output, logs=get_task_logs(), timings=get_task_timings()).model_dump()
 
 
 # Helper to validate request and build context to avoid duplication across tasks
@@ -22,7 +23,13 @@ def validate_request_and_context(args, **kwargs):
 
 
 def typed_task(name: ModelName, queue: str):
-    return celery_app.task(name=f"images.{name}", queue=queue)
+    def decorator(func):
+        # Local models are seeded so identical requests can reuse earlier outputs
+        if queue == "gpu":
+            func = decorator_result_cache(func)
+        return celery_app.task(name=f"images.{name}", queue=queue)(func)
+
+    return decorator
 
 
 # Explicit internal model tasks (lazy-import model implementation inside each task)
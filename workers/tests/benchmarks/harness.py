@@ -0,0 +1,400 @@
+"""
+CPU benchmark of everything around the model call. The real images and videos Celery tasks run eagerly against an
+in-memory Redis, with the diffusers pipelines swapped for a fake that sleeps per denoising step and returns synthetic
+outputs of the requested size. Decode, resize, caching, task logging, encoding and storage all run for real,
+so regressions in the worker plumbing show up without a GPU or model weights.
+
+    python -m tests.benchmarks.harness --output benchmark.json
+    python -m tests.benchmarks.harness --quick --baseline benchmark.json --tolerance 0.25
+"""
+
+import argparse
+import base64
+import importlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from functools import wraps
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+from unittest import mock
+
+import numpy as np
+import psutil
+from PIL import Image
+
+MB = 1024**2
+
+
+class StageTimer:
+    """
+    Wall time per stage. Stages are exclusive, a stage entered inside another one is taken off the outer stage,
+    so the stages of a task add up to its total.
+    """
+
+    def __init__(self):
+        self.totals: Dict[str, float] = {}
+        self._stack: List[list] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        entry = [time.perf_counter(), 0.0]  # start, time spent in nested stages
+        self._stack.append(entry)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            elapsed = time.perf_counter() - entry[0]
+            self.totals[name] = self.totals.get(name, 0.0) + elapsed - entry[1]
+            if self._stack:
+                self._stack[-1][1] += elapsed
+
+    def wrap(self, name: str, func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    def reset(self):
+        self.totals = {}
+
+
+class PeakRSS:
+    """Samples the resident memory of the process on a background thread and keeps the highest value."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.start = self.peak = self.process.memory_info().rss
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.process.memory_info().rss)
+
+    def __enter__(self):
+        self.start = self.peak = self.process.memory_info().rss
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+
+def _gradient(width: int, height: int, shift: int = 0) -> np.ndarray:
+    """Smooth (H, W, 3) uint8 test pattern, compresses like real content unlike noise."""
+    x = np.linspace(0, 255, width, dtype=np.float32)[None, :]
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    pattern = np.empty((height, width, 3), dtype=np.float32)
+    pattern[..., 0] = x
+    pattern[..., 1] = y
+    pattern[..., 2] = (x + y) / 2
+    return ((pattern + shift) % 256).astype(np.uint8)
+
+
+class FakePipeline:
+    """
+    Stands in for a diffusers pipeline. Sleeps step_ms per inference step, calls callback_on_step_end like
+    diffusers does and returns outputs in the diffusers formats, a PIL image list or a (1, F, H, W, 3) float array.
+    """
+
+    def __init__(self, timer: StageTimer, step_ms: float):
+        self.timer = timer
+        self.step_seconds = step_ms / 1000
+        self.scheduler = SimpleNamespace(config={})
+
+    def __call__(
+        self,
+        width: int = 1024,
+        height: int = 1024,
+        num_inference_steps: int = 50,
+        num_frames: Optional[int] = None,
+        callback_on_step_end: Optional[Callable] = None,
+        **kwargs,
+    ):
+        with self.timer.stage("pipeline"):
+            for step in range(num_inference_steps):
+                time.sleep(self.step_seconds)
+                if callback_on_step_end is not None:
+                    with self.timer.stage("step_callback"):
+                        callback_on_step_end(self, step, 1000 - step, {})
+
+            if num_frames is None:
+                return SimpleNamespace(images=[Image.fromarray(_gradient(width, height))])
+
+            frames = np.empty((1, num_frames, height, width, 3), dtype=np.float32)
+            pattern = _gradient(width, height).astype(np.float32)
+            for index in range(num_frames):
+                np.divide((pattern + index * 3) % 256, 255, out=frames[0, index])
+            return SimpleNamespace(frames=frames)
+
+
+def _image_base64(width: int, height: int) -> str:
+    from utils.utils import pil_to_base64
+
+    return pil_to_base64(Image.fromarray(_gradient(width, height))).decode("utf-8")
+
+
+def _video_base64(width: int, height: int, num_frames: int) -> str:
+    from utils.video_io import VideoWriter
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "input.mp4")
+        with VideoWriter(path, fps=24) as writer:
+            for index in range(num_frames):
+                writer.write(_gradient(width, height, shift=index * 3))
+        with open(path, "rb") as file:
+            return base64.b64encode(file.read()).decode("utf-8")
+
+
+@dataclass
+class BenchmarkCase:
+    task_name: str
+    model_module: str  # Module whose pipeline getters are replaced by the fake pipeline
+    payload: Callable[[bool], dict]  # Request payload, smaller in quick mode
+
+
+def _image_size(quick: bool) -> tuple:
+    return (512, 512) if quick else (1280, 720)
+
+
+def _video_size(quick: bool) -> tuple:
+    return (320, 192, 25) if quick else (832, 480, 81)
+
+
+CASES: Dict[str, BenchmarkCase] = {
+    "sd-xl-text-to-image": BenchmarkCase(
+        task_name="images.sd-xl",
+        model_module="images.local.sd_xl",
+        payload=lambda quick: {"model": "sd-xl", "width": _image_size(quick)[0], "height": _image_size(quick)[1]},
+    ),
+    "sd-xl-image-to-image": BenchmarkCase(
+        task_name="images.sd-xl",
+        model_module="images.local.sd_xl",
+        payload=lambda quick: {"model": "sd-xl", "image": _image_base64(*_image_size(quick)), "strength": 0.5},
+    ),
+    "wan-2-text-to-video": BenchmarkCase(
+        task_name="videos.wan-2",
+        model_module="videos.local.wan_2",
+        payload=lambda quick: dict(zip(("width", "height", "num_frames"), _video_size(quick)), model="wan-2"),
+    ),
+    "ltx-video-video-to-video": BenchmarkCase(
+        task_name="videos.ltx-video",
+        model_module="videos.local.ltx_video",
+        payload=lambda quick: {
+            "model": "ltx-video",
+            "num_frames": _video_size(quick)[2],
+            "image": _image_base64(*_video_size(quick)[:2]),
+            "video": _video_base64(*_video_size(quick)),
+        },
+    ),
+}
+
+
+def _instrument(stack: ExitStack, timer: StageTimer, storage_dir: str):
+    """Patches Redis, storage and the model free stages of the tasks, returns the Celery app."""
+    import fakeredis
+
+    from common.config import settings
+
+    # Set before the storage backend is created, so outputs never land in the real storage directory
+    stack.enter_context(mock.patch.object(settings, "ddiffusion_storage_directory", storage_dir))
+    stack.enter_context(mock.patch.object(settings, "result_cache_enabled", True))
+
+    # NOTE import after patching the settings, the task modules are registered through the worker
+    import common.result_cache
+    import images.context
+    import images.tasks
+    import videos.context
+    import videos.tasks
+    from common.pipeline_helpers import _summarise_denoise_metrics
+    from common.redis_manager import redis_manager
+    from common.storage import storage_backend
+    from worker import celery_app
+
+    if storage_backend.local:
+        stack.enter_context(mock.patch.object(storage_backend, "root", Path(storage_dir)))
+
+    server = fakeredis.FakeServer()
+    stack.enter_context(
+        mock.patch.object(redis_manager, "client", fakeredis.FakeRedis(server=server, decode_responses=True))
+    )
+    backend_client = fakeredis.FakeRedis(server=server)
+    stack.enter_context(mock.patch.object(type(celery_app.backend), "client", property(lambda self: backend_client)))
+
+    # Real pipelines get this from instrument_pipeline, so the fake logs the same denoising summary
+    stack.enter_context(mock.patch.object(FakePipeline, "__call__", _summarise_denoise_metrics(FakePipeline.__call__)))
+
+    # Video models seed a CUDA generator
+    get_generator = videos.context.VideoContext.get_generator
+    stack.enter_context(
+        mock.patch.object(
+            videos.context.VideoContext, "get_generator", lambda self, device="cpu": get_generator(self, "cpu")
+        )
+    )
+
+    stages = [
+        ("context", images.tasks, "validate_request_and_context"),
+        ("context", videos.tasks, "validate_request_and_context"),
+        ("decode", images.context, "load_image_if_exists"),
+        ("decode", videos.context, "load_image_if_exists"),
+        ("decode", videos.context, "load_video_frames_if_exists"),
+        ("resize", images.context.ImageContext, "ensure_divisible"),
+        ("resize", videos.context.VideoContext, "rescale_to_max_megapixels"),
+        ("resize", videos.context.VideoContext, "ensure_divisible"),
+        ("resize", videos.context.VideoContext, "get_video_frames_pil"),
+        ("cache_lookup", common.result_cache, "make_result_key"),
+        ("cache_lookup", redis_manager, "get_cached_result"),
+        ("cache_lookup", redis_manager, "set_cached_result"),
+        ("save", images.context.ImageContext, "save_output"),
+        ("save", videos.context.VideoContext, "save_output"),
+        ("store", images.tasks, "store_outputs"),
+        ("store", videos.tasks, "store_outputs"),
+    ]
+    for name, target, attribute in stages:
+        stack.enter_context(mock.patch.object(target, attribute, timer.wrap(name, getattr(target, attribute))))
+
+    return celery_app
+
+
+def _fake_pipelines(stack: ExitStack, module_name: str, pipeline: FakePipeline):
+    module = importlib.import_module(module_name)
+    getters = [name for name in dir(module) if name.startswith("get_") and "pipeline" in name]
+    for name in getters:
+        stack.enter_context(mock.patch.object(module, name, lambda *args, **kwargs: pipeline))
+
+
+def _run_case(celery_app, timer: StageTimer, case: BenchmarkCase, payload: dict, seed: int) -> dict:
+    timer.reset()
+    start = time.perf_counter()
+    with timer.stage("other"):
+        result = celery_app.tasks[case.task_name].apply(
+            args=[{**payload, "seed": seed}], kwargs={"key_id": "benchmark"}, task_id=str(uuid.uuid4()), throw=True
+        )
+    total = time.perf_counter() - start
+
+    stages = {name: seconds * 1000 for name, seconds in timer.totals.items()}
+    stages["total"] = total * 1000
+    stages["outputs"] = len(result.get()["output"])
+    return stages
+
+
+def run_benchmarks(
+    case_names: Optional[List[str]] = None,
+    iterations: int = 3,
+    warmup: int = 1,
+    step_ms: float = 20.0,
+    quick: bool = False,
+) -> dict:
+    """
+    Runs each case warmup + iterations times through its Celery task, every run with a new seed so the result
+    cache never hits. Stage times are means over the measured runs, peak RSS covers all runs of the case.
+    """
+    case_names = case_names or list(CASES)
+    timer = StageTimer()
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "step_ms": step_ms,
+        "iterations": iterations,
+        "quick": quick,
+        "cases": {},
+    }
+
+    with tempfile.TemporaryDirectory(prefix="ddiffusion-benchmark-") as storage_dir, ExitStack() as stack:
+        celery_app = _instrument(stack, timer, storage_dir)
+
+        for name in case_names:
+            case = CASES[name]
+            payload = case.payload(quick)
+            with ExitStack() as case_stack:
+                # Imports the model module, before measuring so its import is not counted as task memory
+                _fake_pipelines(case_stack, case.model_module, FakePipeline(timer, step_ms))
+                with PeakRSS() as rss:
+                    runs = [_run_case(celery_app, timer, case, payload, seed) for seed in range(warmup + iterations)]
+
+            measured = runs[warmup:] or runs
+            keys = sorted({key for run in measured for key in run} - {"outputs", "total"})
+            stages_ms = {key: round(sum(run.get(key, 0.0) for run in measured) / len(measured), 3) for key in keys}
+            total_ms = sum(run["total"] for run in measured) / len(measured)
+            report["cases"][name] = {
+                "task": case.task_name,
+                "outputs": measured[-1]["outputs"],
+                "total_ms": round(total_ms, 3),
+                "overhead_ms": round(total_ms - stages_ms.get("pipeline", 0.0), 3),
+                "stages_ms": stages_ms,
+                "rss_start_mb": round(rss.start / MB, 1),
+                "peak_rss_mb": round(rss.peak / MB, 1),
+                "rss_growth_mb": round((rss.peak - rss.start) / MB, 1),
+            }
+
+    return report
+
+
+# Absolute slack on top of the relative tolerance, keeps tiny values from failing on noise
+_REGRESSION_METRICS = {"overhead_ms": 5.0, "rss_growth_mb": 16.0}
+
+
+def compare_to_baseline(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Regressions of the report against an earlier report, as readable lines."""
+    regressions = []
+    for name, result in report["cases"].items():
+        previous = baseline.get("cases", {}).get(name)
+        if previous is None:
+            continue
+
+        for metric, slack in _REGRESSION_METRICS.items():
+            limit = previous[metric] * (1 + tolerance) + slack
+            if result[metric] > limit:
+                regressions.append(f"{name} {metric}: {result[metric]} > {limit:.1f} (baseline {previous[metric]})")
+
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the worker tasks with fake pipelines on the CPU")
+    parser.add_argument("--case", action="append", choices=list(CASES), help="Case to run, repeatable, default all")
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--step-ms", type=float, default=20.0, help="Simulated time per inference step")
+    parser.add_argument("--quick", action="store_true", help="Small sizes and frame counts, for smoke runs")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="Earlier JSON report, exits non zero on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.case, args.iterations, args.warmup, args.step_ms, args.quick)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+    else:
+        print(text)
+
+    if args.baseline:
+        regressions = compare_to_baseline(report, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for regression in regressions:
+            print(f"Regression {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
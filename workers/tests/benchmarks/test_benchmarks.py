@@ -0,0 +1,46 @@
+import copy
+
+import pytest
+
+from tests.benchmarks.harness import CASES, compare_to_baseline, run_benchmarks
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("case", CASES)
+def test_benchmark(case):
+    report = run_benchmarks([case], iterations=1, warmup=0, step_ms=0, quick=True)
+    result = report["cases"][case]
+    stages = result["stages_ms"]
+
+    assert result["outputs"] == 1
+    assert all(stages[stage] > 0 for stage in ["context", "pipeline", "save", "store"])
+    assert all(0 <= ms <= result["total_ms"] for ms in stages.values())
+    # Stages are exclusive and "other" covers the rest of the task, so together they are its total
+    assert sum(stages.values()) == pytest.approx(result["total_ms"], abs=1)
+    assert 0 < result["overhead_ms"] <= result["total_ms"]
+    assert result["peak_rss_mb"] >= result["rss_start_mb"] > 0
+
+    slower = copy.deepcopy(report)
+    slower["cases"][case]["overhead_ms"] = result["overhead_ms"] * 2 + 10
+    regressions = compare_to_baseline(slower, report, tolerance=0.25)
+    assert len(regressions) == 1 and regressions[0].startswith(f"{case} overhead_ms")
+    assert compare_to_baseline(report, slower, tolerance=0.25) == []
+
+
+@pytest.mark.benchmark
+def test_compare_to_baseline():
+    baseline = {"cases": {"image": {"overhead_ms": 100.0, "rss_growth_mb": 50.0}}}
+
+    def report(overhead_ms, rss_growth_mb):
+        return {"cases": {"image": {"overhead_ms": overhead_ms, "rss_growth_mb": rss_growth_mb}}}
+
+    # Limits are the baseline plus the relative tolerance plus the absolute slack of each metric
+    assert compare_to_baseline(report(130.0, 78.5), baseline, tolerance=0.25) == []
+    assert compare_to_baseline(report(130.1, 50.0), baseline, tolerance=0.25) == [
+        "image overhead_ms: 130.1 > 130.0 (baseline 100.0)"
+    ]
+    assert compare_to_baseline(report(100.0, 80.0), baseline, tolerance=0.25) == [
+        "image rss_growth_mb: 80.0 > 78.5 (baseline 50.0)"
+    ]
+    # Cases missing from the baseline are new, not regressions
+    assert compare_to_baseline({"cases": {"video": {"overhead_ms": 1e6}}}, baseline, tolerance=0) == []
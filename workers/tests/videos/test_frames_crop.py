@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from utils.utils import frames_crop, image_crop
+
+# (source width, source height), (target width, target height)
+sizes = [
+    ((1280, 720), (848, 480)),
+    ((848, 480), (1280, 720)),
+    ((1000, 480), (848, 720)),
+    ((480, 848), (720, 1280)),
+]
+
+
+@pytest.mark.parametrize("source, target", sizes)
+def test_frames_crop_matches_image_crop(source, target):
+    rng = np.random.default_rng(0)
+    frames = rng.integers(0, 256, size=(3, source[1], source[0], 3), dtype=np.uint8)
+
+    cropped = frames_crop(frames, target)
+
+    assert cropped.shape == (3, target[1], target[0], 3)
+    for frame, expected in zip(cropped, frames):
+        np.testing.assert_array_equal(frame, np.asarray(image_crop(Image.fromarray(expected), target)))
+
+
+def test_frames_crop_undersized_is_padded():
+    frames = np.full((2, 480, 848, 3), 255, dtype=np.uint8)
+
+    cropped = frames_crop(frames, (1280, 720))
+
+    assert cropped.shape == (2, 720, 1280, 3)
+    assert cropped[:, 120:600, 216:1064].min() == 255
+    assert cropped[:, :120].max() == 0 and cropped[:, :, :216].max() == 0
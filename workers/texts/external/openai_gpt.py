@@ -5,6 +5,7 @@ from openai import Omit, OpenAI
 
 from common.logger import logger
 from texts.context import TextContext
+from utils.utils import load_base64_if_exists
 
 
 def main(context: TextContext, model_path="gpt-4o-mini") -> str:
@@ -22,7 +23,7 @@ def main(context: TextContext, model_path="gpt-4o-mini") -> str:
         message["content"].append(
             {
                 "type": "input_image",
-                "image_url": f"data:image/png;base64,{image}",
+                "image_url": f"data:image/png;base64,{load_base64_if_exists(image)}",
             }
         )
 
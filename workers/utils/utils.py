@@ -1,15 +1,20 @@
 import base64
 import io
 import os
+import re
 import tempfile
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Literal, Optional, Tuple
 
-from diffusers.utils import load_video
+import numpy as np
 from PIL import Image
 
 from common.config import settings
 from common.logger import logger
+from common.metrics import timed_span
+from common.schemas import BLOB_REF_PREFIX
+from utils.video_io import read_video_frames
 
 Resolutions = Literal["1080p", "900p", "720p", "576p", "540p", "480p", "432p", "360p"]
 resolutions_16_9 = {
@@ -89,11 +94,96 @@ def image_crop(img: Image.Image, target_size: tuple[int, int]) -> Image.Image:
     return img.crop((left, top, right, bottom))
 
 
+def frames_resize(frames: np.ndarray, target_size: tuple[int, int], resampler=Image.Resampling.LANCZOS) -> np.ndarray:
+    """Resize (T, H, W, 3) frames, spread over a thread pool as PIL releases the GIL while resampling."""
+    width, height = target_size
+    if frames.shape[1:3] == (height, width):
+        return frames
+
+    logger.info(f"Resizing {len(frames)} frames from {frames.shape[2]}x{frames.shape[1]} to {width}x{height}")
+    output = np.empty((len(frames), height, width, frames.shape[3]), dtype=np.uint8)
+
+    def resize(index: int):
+        output[index] = np.asarray(Image.fromarray(frames[index]).resize(target_size, resampler))
+
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        list(executor.map(resize, range(len(frames))))
+
+    return output
+
+
+def frames_crop(frames: np.ndarray, target_size: tuple[int, int]) -> np.ndarray:
+    """
+    Center crop (T, H, W, 3) frames, returns a view of the input so nothing is copied.
+    Sides smaller than the target are padded with black like image_crop, which needs a copy.
+    """
+    width, height = target_size
+    if frames.shape[1:3] == (height, width):
+        return frames
+
+    # Same offsets as image_crop
+    left = round((frames.shape[2] - width) / 2)
+    top = round((frames.shape[1] - height) / 2)
+
+    logger.info(f"Cropping {len(frames)} frames from {frames.shape[2]}x{frames.shape[1]} to {width}x{height}")
+    if left >= 0 and top >= 0:
+        return frames[:, top : top + height, left : left + width]
+
+    output = np.zeros((len(frames), height, width, frames.shape[3]), dtype=frames.dtype)
+    source_top, source_left = max(top, 0), max(left, 0)
+    target_top, target_left = max(-top, 0), max(-left, 0)
+    copy_height = min(frames.shape[1] - source_top, height - target_top)
+    copy_width = min(frames.shape[2] - source_left, width - target_left)
+    output[:, target_top : target_top + copy_height, target_left : target_left + copy_width] = frames[
+        :, source_top : source_top + copy_height, source_left : source_left + copy_width
+    ]
+    return output
+
+
+def get_blob_path(value: str) -> Optional[str]:
+    """Path of an uploaded input if value is a blob reference rather than base64 data."""
+    if not value.startswith(BLOB_REF_PREFIX):
+        return None
+
+    blob_id = value[len(BLOB_REF_PREFIX) :]
+    if not re.fullmatch(r"[0-9a-f]{64}", blob_id):
+        raise ValueError(f"Invalid blob reference: {value}")
+
+    path = os.path.join(settings.storage_dir, "blobs", blob_id[:2], blob_id)
+    if not os.path.isfile(path):
+        raise ValueError(f"Blob not found: {value}")
+
+    return path
+
+
+def load_input_bytes(value: str) -> bytes:
+    """Raw bytes of an input given as base64 data or a blob reference."""
+    blob_path = get_blob_path(value)
+    if blob_path is None:
+        return base64.b64decode(value)
+
+    with open(blob_path, "rb") as f:
+        return f.read()
+
+
+def load_base64_if_exists(value: Optional[str]) -> Optional[str]:
+    """Base64 data for an input, for external providers that only accept inline data."""
+    if (value is None) or (value == ""):
+        return None
+
+    blob_path = get_blob_path(value)
+    if blob_path is None:
+        return value
+
+    with open(blob_path, "rb") as f:
+        return base64.b64encode(f.read()).decode("utf-8")
+
+
+@timed_span("decode")
 def load_image_from_base64(base64_bytes: str) -> Image.Image:
     try:
-        # Convert bytes to a PIL image
-        tmp_bytes = base64.b64decode(base64_bytes)
-        image = Image.open(io.BytesIO(tmp_bytes))
+        # Blob references are opened straight from storage
+        image = Image.open(get_blob_path(base64_bytes) or io.BytesIO(base64.b64decode(base64_bytes)))
         image = image.convert("RGB")  # type: ignore
         logger.info(f"Image loaded from Base64 bytes, size: {image.size}")
         return image
@@ -156,27 +246,40 @@ def load_video_bytes_if_exists(base64_bytes: Optional[str]) -> Optional[bytes]:
     if (base64_bytes is None) or (base64_bytes == ""):
         return None
     try:
-        return base64.b64decode(base64_bytes)
+        return load_input_bytes(base64_bytes)
     except Exception as e:
         raise ValueError(f"Invalid Base64 video data: {type(base64_bytes)} {e}") from e
 
 
-def load_video_frames_if_exists(base64_bytes: Optional[str], model="") -> Optional[list[Image.Image]]:
-    """Load video from Base64 string and return frames as PIL images."""
+@timed_span("decode")
+def load_video_frames_if_exists(
+    base64_bytes: Optional[str], model="", max_frames: Optional[int] = None
+) -> Optional[np.ndarray]:
+    """Load video from Base64 string and return frames as a (T, H, W, 3) uint8 array, decoding at most max_frames."""
+    if base64_bytes and (blob_path := get_blob_path(base64_bytes)):
+        return read_video_frames(blob_path, max_frames)
+
     video_bytes = load_video_bytes_if_exists(base64_bytes)
     if video_bytes is None:
         return None
 
-    video_path = tempfile.NamedTemporaryFile(dir=settings.storage_dir, suffix=".mp4").name
-    with open(video_path, "wb") as f:
-        f.write(video_bytes)
+    video_path = tempfile.NamedTemporaryFile(dir=settings.storage_dir, suffix=".mp4", delete=False).name
+    try:
+        with open(video_path, "wb") as f:
+            f.write(video_bytes)
+        del video_bytes
 
-    pil_images = load_video(video_path)
-    return pil_images
+        return read_video_frames(video_path, max_frames)
+    finally:
+        os.remove(video_path)
 
 
+@timed_span("decode")
 def load_video_into_file(base64_bytes: Optional[str], model="") -> str | None:
     """Load video from Base64 string and return the file path."""
+    if base64_bytes and (blob_path := get_blob_path(base64_bytes)):
+        return blob_path
+
     video_bytes = load_video_bytes_if_exists(base64_bytes)
     if video_bytes is None:
         return None
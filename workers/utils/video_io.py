@@ -0,0 +1,87 @@
+from typing import Optional
+
+import imageio_ffmpeg
+import numpy as np
+from PIL import Image
+
+
+def read_video_frames(path: str, max_frames: Optional[int] = None) -> np.ndarray:
+    """
+    Decode a video through ffmpeg into one contiguous (T, H, W, 3) uint8 RGB array, at most max_frames.
+    Frames are written straight into the array, which is sized up front from the duration in the metadata.
+    """
+    reader = imageio_ffmpeg.read_frames(path, pix_fmt="rgb24")
+    try:
+        meta = next(reader)
+        width, height = meta["size"]
+        capacity = int((meta.get("duration") or 0) * (meta.get("fps") or 0)) + 1
+        if max_frames is not None:
+            capacity = min(capacity, max_frames)
+
+        frames = np.empty((capacity, height, width, 3), dtype=np.uint8)
+        count = 0
+        for frame in reader:
+            if max_frames is not None and count >= max_frames:
+                break
+            if count == len(frames):  # More frames than the metadata suggested
+                frames = np.concatenate([frames, np.empty_like(frames[: max(1, len(frames) // 4)])])
+
+            frames[count] = np.frombuffer(frame, dtype=np.uint8).reshape(height, width, 3)
+            count += 1
+
+        return frames[:count]
+    finally:
+        reader.close()  # Stops ffmpeg if we stopped reading early
+
+
+def frame_to_uint8(frame) -> np.ndarray:
+    """Pipeline output frame (PIL image, uint8 array or float array in 0-1) as a (H, W, 3) uint8 array."""
+    if isinstance(frame, Image.Image):
+        return np.asarray(frame.convert("RGB"))
+
+    array = np.asarray(frame)
+    if array.dtype != np.uint8:
+        # Same conversion as diffusers export_to_video
+        array = (array * 255).astype(np.uint8)
+    if array.ndim == 2:
+        array = np.repeat(array[..., None], 3, axis=2)
+    return array
+
+
+class VideoWriter:
+    """
+    Encodes frames as they are written through a single ffmpeg process, so only the frame being written is held
+    in memory instead of the whole clip. Uses the defaults of diffusers export_to_video (libx264, yuv420p).
+    """
+
+    def __init__(self, path: str, fps: int = 24, quality: float = 9):
+        self.path = path
+        self.fps = fps
+        self.quality = quality
+        self.frames = 0
+        self._encoder = None
+
+    def write(self, frame):
+        array = frame_to_uint8(frame)
+        if self._encoder is None:
+            height, width = array.shape[:2]
+            self._encoder = imageio_ffmpeg.write_frames(
+                self.path, (width, height), fps=self.fps, quality=self.quality, macro_block_size=16
+            )
+            self._encoder.send(None)  # Starts the ffmpeg process
+
+        self._encoder.send(np.ascontiguousarray(array))
+        self.frames += 1
+
+    def close(self):
+        if self._encoder is not None:
+            self._encoder.close()
+            self._encoder = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        if exc_type is None and self.frames == 0:
+            raise ValueError(f"No frames written to {self.path}")
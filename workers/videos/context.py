@@ -1,20 +1,26 @@
 import copy
+from functools import cached_property
 from pathlib import Path
-from typing import Literal
+from typing import Literal, Optional
 
 import httpx
+import numpy as np
 import torch
-from diffusers.utils import export_to_video
+from PIL import Image
 
 from common.config import settings
 from common.logger import get_task_id, logger, task_log
+from common.metrics import timed_span
 from utils.utils import (
     ensure_divisible,
+    frames_crop,
+    frames_resize,
     image_crop,
     image_resize,
     load_image_if_exists,
     load_video_frames_if_exists,
 )
+from utils.video_io import VideoWriter
 from videos.schemas import VideoRequest
 
 
@@ -29,13 +35,21 @@ class VideoContext:
         if self.image:
             self.width, self.height = self.image.size
 
-        self.video_frames = load_video_frames_if_exists(data.video, model=self.model)
         self.last_image = load_image_if_exists(data.last_image)
 
         task_log(
             f"Context created {self.model}, {self.width}x{self.height}",
         )
 
+    @cached_property
+    def video_frames(self) -> Optional[np.ndarray]:
+        """
+        Input video frames as one (T, H, W, 3) uint8 array, decoded on first use so models that only pass the
+        video on never decode it. SAM-3 tracks through the whole clip, other models use at most num_frames.
+        """
+        max_frames = None if self.model == "sam-3" else self.data.num_frames
+        return load_video_frames_if_exists(self.data.video, model=self.model, max_frames=max_frames)
+
     def get_generator(self, device="cuda"):
         return torch.Generator(device=device).manual_seed(self.data.seed)
 
@@ -64,9 +78,8 @@ class VideoContext:
             self.image = image_resize(self.image, (self.width, self.height))
         if self.last_image:
             self.last_image = image_resize(self.last_image, (self.width, self.height))
-        if self.video_frames:
-            for frame_idx in range(len(self.video_frames)):
-                self.video_frames[frame_idx] = image_resize(self.video_frames[frame_idx], (self.width, self.height))
+        if self.video_frames is not None:
+            self.video_frames = frames_resize(self.video_frames, (self.width, self.height))
 
     def ensure_divisible(self, value: int):
         """Adjust width and height to be divisible by the specified value."""
@@ -77,9 +90,14 @@ class VideoContext:
             self.image = image_crop(self.image, (self.width, self.height))
         if self.last_image:
             self.last_image = image_crop(self.last_image, (self.width, self.height))
-        if self.video_frames:
-            for frame_idx in range(len(self.video_frames)):
-                self.video_frames[frame_idx] = image_crop(self.video_frames[frame_idx], (self.width, self.height))
+        if self.video_frames is not None:
+            self.video_frames = frames_crop(self.video_frames, (self.width, self.height))
+
+    def get_video_frames_pil(self, num_frames: Optional[int] = None) -> list[Image.Image]:
+        """The first num_frames input frames as PIL images, for the pipelines that take them."""
+        if self.video_frames is None:
+            return []
+        return [Image.fromarray(frame) for frame in self.video_frames[:num_frames]]
 
     def get_dimension_type(self) -> Literal["square", "landscape", "portrait"]:
         """Determine the image dimension type based on width and height ratio."""
@@ -103,16 +121,21 @@ class VideoContext:
         abs_path.parent.mkdir(parents=True, exist_ok=True)
         return abs_path
 
+    @timed_span("save")
     def save_output(self, video, index: int = 0, fps=24) -> Path:
         abs_path = self.get_output_path(index)
         try:
-            export_to_video(video, output_video_path=str(abs_path), fps=fps, quality=9)
-            logger.info(f"Video saved at {abs_path}")
+            # Frames are encoded one by one, video can also be a generator so the clip is never held in memory
+            with VideoWriter(str(abs_path), fps=fps, quality=9) as writer:
+                for frame in video:
+                    writer.write(frame)
+            logger.info(f"Video saved at {abs_path}, {writer.frames} frames")
         except Exception as e:
             raise RuntimeError(f"Failed to save video at {abs_path}: {e}")
 
         return abs_path
 
+    @timed_span("save")
     def save_output_url(self, url, index: int = 0) -> Path:
         abs_path = self.get_output_path(index)
 
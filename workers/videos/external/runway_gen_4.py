@@ -2,7 +2,7 @@ from pathlib import Path
 from typing import List, Literal
 
 from common.replicate_helpers import process_replicate_video_output, replicate_run
-from utils.utils import convert_pil_to_bytes
+from utils.utils import convert_pil_to_bytes, load_base64_if_exists
 from videos.context import VideoContext
 
 
@@ -20,7 +20,7 @@ def video_to_video(context: VideoContext) -> List[Path]:
         raise ValueError("Input video is None. Please provide a valid video.")
 
     model = "runwayml/gen4-aleph"
-    video_uri = f"data:video/mp4;base64,{context.data.video}"
+    video_uri = f"data:video/mp4;base64,{load_base64_if_exists(context.data.video)}"
     payload = {
         "prompt": context.data.cleaned_prompt,
         "seed": context.data.seed,
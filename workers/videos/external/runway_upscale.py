@@ -2,6 +2,7 @@ from pathlib import Path
 from typing import List
 
 from common.replicate_helpers import process_replicate_video_output, replicate_run
+from utils.utils import load_base64_if_exists
 from videos.context import VideoContext
 
 
@@ -10,7 +11,7 @@ def main(context: VideoContext) -> List[Path]:
         raise ValueError("Input video is None. Please provide a valid video.")
 
     model = "runwayml/upscale-v1"
-    video_uri = f"data:video/mp4;base64,{context.data.video}"
+    video_uri = f"data:video/mp4;base64,{load_base64_if_exists(context.data.video)}"
     payload = {
         "video": video_uri,
     }
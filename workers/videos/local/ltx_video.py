@@ -52,11 +52,11 @@ def image_to_video(context: VideoContext) -> List[Path]:
     )
     conditions = [condition1]
 
-    if context.video_frames:
+    if context.video_frames is not None:
         num_frames = min(num_frames, len(context.video_frames))
         video_condition = LTXVideoCondition(
             image=context.image,
-            video=context.video_frames[:num_frames],
+            video=context.get_video_frames_pil(num_frames),
             frame_index=0,
         )
         conditions.append(video_condition)
@@ -38,8 +38,9 @@ def main(context: VideoContext) -> List[Path]:
     processor = Sam3VideoProcessor.from_pretrained("facebook/sam3")
 
     # Initialize video inference session
+    video_frames = context.get_video_frames_pil()
     inference_session = processor.init_video_session(
-        video=context.video_frames,
+        video=video_frames,
         inference_device=device,
         processing_device="cpu",
         video_storage_device="cpu",
@@ -53,8 +54,7 @@ def main(context: VideoContext) -> List[Path]:
         text=prompts,
     )
 
-    processed_frames = []
-    original_frame_size = context.video_frames[0].size
+    original_frame_size = video_frames[0].size
 
     def mask_color(idx):
         if idx == 0:
@@ -64,26 +64,29 @@ def main(context: VideoContext) -> List[Path]:
         else:
             return (0, 0, 255)
 
-    for model_outputs in model.propagate_in_video_iterator(
-        inference_session=inference_session, max_frame_num_to_track=None
-    ):
-        # postprocess to extract masks as numpy/boolean
-        processed_outputs = processor.postprocess_outputs(inference_session, model_outputs)
-        masks = processed_outputs["masks"]  # shape: (num_objects, H, W)
+    def mask_frames():
+        for model_outputs in model.propagate_in_video_iterator(
+            inference_session=inference_session, max_frame_num_to_track=None
+        ):
+            # postprocess to extract masks as numpy/boolean
+            processed_outputs = processor.postprocess_outputs(inference_session, model_outputs)
+            masks = processed_outputs["masks"]  # shape: (num_objects, H, W)
 
-        h, w = masks.shape[1], masks.shape[2]
-        combined = np.zeros((h, w, 3), dtype=np.uint8)
+            h, w = masks.shape[1], masks.shape[2]
+            combined = np.zeros((h, w, 3), dtype=np.uint8)
 
-        for idx, mask in enumerate(masks):
-            color = mask_color(idx)
-            combined[mask.cpu().numpy()] = color
+            for idx, mask in enumerate(masks):
+                color = mask_color(idx)
+                combined[mask.cpu().numpy()] = color
 
-        # Resize to original frame if needed
-        combined_img = image_resize(Image.fromarray(combined), original_frame_size, Image.Resampling.NEAREST)
-        processed_frames.append(combined_img)
+            # Resize to original frame if needed
+            yield image_resize(Image.fromarray(combined), original_frame_size, Image.Resampling.NEAREST)
+
+    # Frames are encoded as they are tracked instead of being collected first
+    result = context.save_output(mask_frames(), fps=24)
 
     # Clean up
     del model, processor, inference_session
     free_gpu_memory(message="Post SAM-3 Video Processing")
 
-    return [context.save_output(processed_frames, fps=24)]
+    return [result]
@@ -3,7 +3,6 @@ from typing import List
 
 import torch
 from diffusers import (
-    AutoencoderKLWan,
     UniPCMultistepScheduler,
     WanImageToVideoPipeline,
     WanPipeline,
@@ -18,6 +17,7 @@ from common.pipeline_helpers import (
     task_log_callback,
 )
 from common.text_encoders import get_umt5_text_encoder
+from common.vaes import get_wan_vae
 from videos.context import VideoContext
 
 # Wan gives better results with a default negative prompt
@@ -48,7 +48,7 @@ def get_pipeline_t2v(model_id) -> WanPipeline:
         transformer=transformer,
         transformer_2=transformer_2,
         text_encoder=get_umt5_text_encoder(),
-        vae=AutoencoderKLWan.from_pretrained(model_id, subfolder="vae", torch_dtype=torch.float32),
+        vae=get_wan_vae(),
         torch_dtype=torch.bfloat16,
         **args,
     )
@@ -83,7 +83,7 @@ def get_pipeline_i2v(model_id) -> WanImageToVideoPipeline:
         transformer=transformer,
         transformer_2=transformer_2,
         text_encoder=get_umt5_text_encoder(),
-        vae=AutoencoderKLWan.from_pretrained(model_id, subfolder="vae", torch_dtype=torch.float32),
+        vae=get_wan_vae(),
         torch_dtype=torch.bfloat16,
         **args,
     )
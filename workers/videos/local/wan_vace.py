@@ -3,7 +3,7 @@ from typing import List
 
 import PIL.Image
 import torch
-from diffusers import AutoencoderKLWan, WanVACEPipeline, WanVACETransformer3DModel
+from diffusers import WanVACEPipeline, WanVACETransformer3DModel
 from diffusers.schedulers.scheduling_unipc_multistep import UniPCMultistepScheduler
 
 from common.logger import logger
@@ -15,6 +15,7 @@ from common.pipeline_helpers import (
     task_log_callback,
 )
 from common.text_encoders import get_umt5_text_encoder
+from common.vaes import get_wan_vae
 from utils.utils import image_resize
 from videos.context import VideoContext
 
@@ -35,7 +36,7 @@ def get_pipeline(model_id, torch_dtype=torch.bfloat16) -> WanVACEPipeline:
 
     pipe = WanVACEPipeline.from_pretrained(
         model_id,
-        vae=AutoencoderKLWan.from_pretrained(model_id, subfolder="vae", torch_dtype=torch.float32),
+        vae=get_wan_vae(),
         transformer=transformer,
         text_encoder=get_umt5_text_encoder(),
         torch_dtype=torch_dtype,
@@ -61,11 +62,7 @@ def video_to_video(context: VideoContext) -> List[Path]:
     num_frames = context.ensure_frames_divisible(num_frames, 4)
 
     # Use existing video frames, resized to target dimensions
-    video_frames = []
-    for i in range(num_frames):
-        frame_idx = min(i, len(context.video_frames) - 1)
-        frame = context.video_frames[frame_idx]
-        video_frames.append(frame)
+    video_frames = context.get_video_frames_pil(num_frames)
 
     mask_black = PIL.Image.new("L", (context.width, context.height), 0)
     mask_white = PIL.Image.new("L", (context.width, context.height), 255)
@@ -43,6 +43,9 @@ celery_app.conf.task_max_retries = 1  # Default max retries
 celery_app.conf.task_time_limit = 11 * 60  # 11 minutes hard limit
 celery_app.conf.task_soft_time_limit = 10 * 60  # 10 minutes soft limit
 
+# NOTE import signal handlers so they're connected before the worker starts
+import common.signals
+
 # NOTE import task modules so they're registered with Celery
 import images.tasks
 import texts.tasks
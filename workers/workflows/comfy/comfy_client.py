@@ -1,4 +1,3 @@
-import base64
 import json
 import time
 import uuid
@@ -9,6 +8,7 @@ import websocket
 
 from common.config import settings
 from common.logger import logger, task_log
+from utils.utils import load_input_bytes
 
 
 class ComfyClient:
@@ -92,7 +92,7 @@ class ComfyClient:
 
     def upload_image(self, base64_str: str, subfolder: str, filename: str) -> str:
         """Upload an image / video to ComfyUI's input directory."""
-        file_bytes = base64.b64decode(base64_str)
+        file_bytes = load_input_bytes(base64_str)
         files = {"image": (filename, file_bytes, "application/octet-stream")}
         data = {"subfolder": subfolder or "", "type": "input", "overwrite": "1"}
 
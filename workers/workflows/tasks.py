@@ -1,17 +1,15 @@
 from pathlib import Path
 from typing import List
 
-from common.config import settings
 from common.logger import get_task_logs
+from common.storage import store_outputs
 from worker import celery_app
 from workflows.context import WorkflowContext
 from workflows.schemas import WorkflowRequest, WorkflowWorkerResponse
 
 
 def process_result(context: WorkflowContext, result: List[Path]):
-    storage_dir = Path(settings.storage_dir)
-    output = [str(path.relative_to(storage_dir)) for path in result]
-    return WorkflowWorkerResponse(output=output, logs=get_task_logs()).model_dump()
+    return WorkflowWorkerResponse(output=store_outputs(result), logs=get_task_logs()).model_dump()
 
 
 # Helper to validate request and build context to avoid duplication across tasks